@@ -1,28 +1,102 @@
-from dataclasses import dataclass
+import os
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Dict
+
+
+@dataclass(frozen=True)
+class IndexConfig:
+    kind: str = "flat"  # flat | hnsw | ivf_flat | ivf_pq
+    min_vectors: int = 10_000
+    nlist: int = 0  # 0 picks ~4*sqrt(n)
+    nprobe: int = 16
+    hnsw_m: int = 32
+    ef_construction: int = 200
+    ef_search: int = 64
+    pq_m: int = 16
+    pq_nbits: int = 8
+    recall_k: int = 10
+    recall_queries: int = 200
 
 
 @dataclass(frozen=True)
 class Settings:
     project_root: Path = Path(__file__).resolve().parents[1]
-    data_dir: Path = project_root / "data"
+    data_dir: Path = Path(os.environ.get("POS_DATA_DIR") or project_root / "data")  # env override for benchmarks
     sources_dir: Path = data_dir / "sources"
     index_dir: Path = data_dir / "index"
     sqlite_dir: Path = data_dir / "sqlite"
+    onnx_dir: Path = data_dir / "onnx"
 
     db_path: Path = sqlite_dir / "pos_rag.sqlite3"
 
+    sqlite_persistent_connections: bool = True
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
+    sqlite_busy_timeout_s: float = 30.0
+
     modes: tuple = ("study", "build", "career", "life", "health")
 
     embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_backend: str = "torch"  # torch | onnx (ONNX Runtime, exported to onnx_dir on first use)
+    embedding_quantize: bool = False  # onnx only: dynamic int8 weights
+    embedding_threads: int = 0  # intra-op threads for encoding, 0 = library default
+    chunking: str = "chars"  # chars | tokens (measured with the embedding model's tokenizer)
     chunk_size_chars: int = 1400
     chunk_overlap_chars: int = 250
+    chunk_max_tokens: int = 256  # the embedding model's max_seq_length, special tokens included
+    chunk_overlap_tokens: int = 32
+
+    index_compact_ratio: float = 0.3
+    default_index: IndexConfig = IndexConfig()
+    index_configs: Dict[str, IndexConfig] = field(default_factory=dict)
+    index_keep_versions: int = 2  # published index versions kept on disk per mode
+    index_mmap: bool = True  # memory-map FAISS indexes instead of reading them into RAM
+    index_verify_checksums: bool = False  # hash every bundle file on load, not just check sizes
+
+    hash_workers: int = 4
+    hash_block_size: int = 1024 * 1024
+
+    ingest_workers: int = max(1, (os.cpu_count() or 2) - 1)
+    ingest_queue_depth: int = 8
+    embed_batch_size: int = 64
+    reindex_job_history: int = 50
+
+    watch_sources: bool = False  # run the source watcher inside the API process
+    watch_use_inotify: bool = True  # falls back to polling when inotify_simple is missing
+    watch_debounce_s: float = 1.0
+    watch_max_delay_s: float = 10.0
+    watch_poll_interval_s: float = 2.0
 
     retrieve_k: int = 8
     candidate_k: int = 40
 
+    hybrid_search: bool = True
+    lexical_k: int = 40
+    rrf_k: int = 60
+    retrieval_batch_window_ms: float = 3.0  # 0 disables micro-batching
+    retrieval_max_batch: int = 32
+
+    query_embedding_cache_size: int = 2048
+    answer_cache_size: int = 512
+
+    shard_score_norm: str = "zscore"  # none | minmax | zscore, used when querying several modes
+
     min_top_score: float = 0.15
     min_mean_score: float = 0.12
+    lexical_score_scale: float = 8.0  # BM25 score that maps to a lexical confidence of 0.5
+    min_lexical_score: float = 0.55  # a cited keyword match this confident answers despite low dense scores
+
+    slow_query_ms: float = 2000.0  # 0 disables the slow-query log
+    slow_query_log: Path = data_dir / "logs" / "slow_queries.jsonl"
+    profiler: str = "cprofile"  # cprofile | sample (stack sampling across all threads)
+    profile_sample_rate: float = 0.0  # fraction of queries and index runs profiled without being asked
+    profile_sample_interval_ms: float = 5.0
+    profile_dir: Path = data_dir / "profiles"
+
+    def index_config(self, mode: str) -> IndexConfig:
+        return self.index_configs.get(mode, self.default_index)
 
 
 settings = Settings()
\ No newline at end of file
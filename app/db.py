@@ -1,22 +1,17 @@
 import sqlite3
+import threading
 from contextlib import contextmanager
 from pathlib import Path
 from typing import Iterator, Optional, Any, Dict, List, Tuple
 
+from app.config import settings
+from app.ingest.hashing import stable_chunk_key
 
-SCHEMA = """
-PRAGMA journal_mode=WAL;
-
-CREATE TABLE IF NOT EXISTS documents (
-    doc_id TEXT PRIMARY KEY,
-    mode TEXT NOT NULL,
-    path TEXT NOT NULL,
-    file_hash TEXT NOT NULL,
-    updated_at TEXT NOT NULL
-);
 
+CHUNKS_TABLE = """
 CREATE TABLE IF NOT EXISTS chunks (
-    chunk_id TEXT PRIMARY KEY,
+    chunk_key INTEGER PRIMARY KEY,
+    chunk_id TEXT NOT NULL,
     doc_id TEXT NOT NULL,
     mode TEXT NOT NULL,
     chunk_hash TEXT NOT NULL,
@@ -25,59 +20,281 @@ CREATE TABLE IF NOT EXISTS chunks (
     page INTEGER,
     start_char INTEGER,
     end_char INTEGER,
+    unit INTEGER,
     FOREIGN KEY(doc_id) REFERENCES documents(doc_id)
 );
+""".strip()
+
+SCHEMA = f"""
+PRAGMA journal_mode=WAL;
+
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id TEXT PRIMARY KEY,
+    mode TEXT NOT NULL,
+    path TEXT NOT NULL,
+    file_hash TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    size_bytes INTEGER,
+    mtime_ns INTEGER,
+    chunker TEXT
+);
+
+{CHUNKS_TABLE}
 
 CREATE INDEX IF NOT EXISTS idx_chunks_mode ON chunks(mode);
 CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(doc_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_hash ON chunks(chunk_hash);
+
+CREATE TABLE IF NOT EXISTS document_pages (
+    doc_id TEXT NOT NULL,
+    unit INTEGER NOT NULL,
+    page INTEGER,
+    page_hash TEXT NOT NULL,
+    PRIMARY KEY(doc_id, unit)
+);
+
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    chunk_hash TEXT NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    PRIMARY KEY(model, chunk_hash)
+);
 """
 
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    mode UNINDEXED,
+    heading,
+    text,
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS chunks_fts_insert AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, mode, heading, text)
+    VALUES (new.chunk_key, new.mode, new.heading, new.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS chunks_fts_delete AFTER DELETE ON chunks BEGIN
+    DELETE FROM chunks_fts WHERE rowid = old.chunk_key;
+END;
+
+CREATE TRIGGER IF NOT EXISTS chunks_fts_update AFTER UPDATE ON chunks BEGIN
+    DELETE FROM chunks_fts WHERE rowid = old.chunk_key;
+    INSERT INTO chunks_fts(rowid, mode, heading, text)
+    VALUES (new.chunk_key, new.mode, new.heading, new.text);
+END;
+"""
+
+SQLITE_MAX_VARS = 500
+
+# Columns added after the first release, applied to existing databases by DB.init().
+MIGRATIONS = {
+    "documents": [
+        ("size_bytes", "INTEGER"),
+        ("mtime_ns", "INTEGER"),
+        ("chunker", "TEXT"),
+    ],
+    "chunks": [
+        ("unit", "INTEGER"),
+    ],
+}
+
 
 class DB:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, persistent: Optional[bool] = None):
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.persistent = settings.sqlite_persistent_connections if persistent is None else persistent
+        self._local = threading.local()
+        self.fts_enabled = False
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=settings.sqlite_busy_timeout_s)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+        conn.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+        conn.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kib)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
 
     @contextmanager
     def connect(self) -> Iterator[sqlite3.Connection]:
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self._open()
+        if self.persistent:
+            self._local.conn = conn
+            yield conn
+            return
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _in_transaction(self) -> bool:
+        return getattr(self._local, "tx_depth", 0) > 0
+
+    def _commit(self, conn: sqlite3.Connection) -> None:
+        if not self._in_transaction():
+            conn.commit()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        local = self._local
+        owns_conn = getattr(local, "conn", None) is None
+        if owns_conn:
+            local.conn = self._open()
+        conn = local.conn
+        outermost = not self._in_transaction()
+        local.tx_depth = getattr(local, "tx_depth", 0) + 1
         try:
+            if outermost and not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
             yield conn
+            if outermost:
+                conn.commit()
+        except BaseException:
+            if outermost:
+                conn.rollback()
+            raise
         finally:
+            local.tx_depth -= 1
+            if owns_conn and not self.persistent:
+                local.conn = None
+                conn.close()
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and not self._in_transaction():
+            self._local.conn = None
             conn.close()
 
     def init(self) -> None:
         with self.connect() as conn:
             conn.executescript(SCHEMA)
+            self._migrate(conn)
             conn.commit()
+            self._migrate_chunk_keys(conn)
+            self.fts_enabled = self._init_fts(conn)
 
-    def upsert_document(self, doc_id: str, mode: str, path: str, file_hash: str, updated_at: str) -> None:
+    def _init_fts(self, conn: sqlite3.Connection) -> bool:
+        try:
+            conn.executescript(FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            return False
+        fts_rows = conn.execute("SELECT COUNT(*) AS n FROM chunks_fts").fetchone()["n"]
+        chunk_rows = conn.execute("SELECT COUNT(*) AS n FROM chunks").fetchone()["n"]
+        if fts_rows != chunk_rows:
+            conn.execute("DELETE FROM chunks_fts")
+            conn.execute(
+                """
+                INSERT INTO chunks_fts(rowid, mode, heading, text)
+                SELECT chunk_key, mode, heading, text FROM chunks
+                """
+            )
+        conn.commit()
+        return True
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        for table, columns in MIGRATIONS.items():
+            existing = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+            for name, decl in columns:
+                if name not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+    def _migrate_chunk_keys(self, conn: sqlite3.Connection) -> None:
+        # Databases from before integer chunk keys have chunk_id TEXT as the primary
+        # key. Rebuild the table with chunk_key as the rowid, and drop the old FTS
+        # table so _init_fts recreates and backfills it keyed on chunk_key.
+        existing = {r["name"] for r in conn.execute("PRAGMA table_info(chunks)").fetchall()}
+        if "chunk_key" in existing:
+            return
+        conn.create_function("chunk_key", 1, stable_chunk_key, deterministic=True)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for trigger in ("chunks_fts_insert", "chunks_fts_delete", "chunks_fts_update"):
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            conn.execute("DROP TABLE IF EXISTS chunks_fts")
+            conn.execute("ALTER TABLE chunks RENAME TO chunks_legacy")
+            for index in ("idx_chunks_mode", "idx_chunks_doc", "idx_chunks_hash"):
+                conn.execute(f"DROP INDEX IF EXISTS {index}")
+            conn.execute(CHUNKS_TABLE)
+            conn.execute(
+                """
+                INSERT INTO chunks(chunk_key, chunk_id, doc_id, mode, chunk_hash, text, heading, page, start_char, end_char)
+                SELECT chunk_key(chunk_id), chunk_id, doc_id, mode, chunk_hash, text, heading, page, start_char, end_char
+                FROM chunks_legacy
+                """
+            )
+            conn.execute("DROP TABLE chunks_legacy")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.executescript(SCHEMA)
+
+    def upsert_document(
+        self,
+        doc_id: str,
+        mode: str,
+        path: str,
+        file_hash: str,
+        updated_at: str,
+        size_bytes: Optional[int] = None,
+        mtime_ns: Optional[int] = None,
+        chunker: Optional[str] = None,
+    ) -> None:
         with self.connect() as conn:
             conn.execute(
                 """
-                INSERT INTO documents(doc_id, mode, path, file_hash, updated_at)
-                VALUES(?, ?, ?, ?, ?)
+                INSERT INTO documents(doc_id, mode, path, file_hash, updated_at, size_bytes, mtime_ns, chunker)
+                VALUES(?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(doc_id) DO UPDATE SET
                   mode=excluded.mode,
                   path=excluded.path,
                   file_hash=excluded.file_hash,
-                  updated_at=excluded.updated_at
+                  updated_at=excluded.updated_at,
+                  size_bytes=excluded.size_bytes,
+                  mtime_ns=excluded.mtime_ns,
+                  chunker=excluded.chunker
                 """,
-                (doc_id, mode, path, file_hash, updated_at),
+                (doc_id, mode, path, file_hash, updated_at, size_bytes, mtime_ns, chunker),
             )
-            conn.commit()
+            self._commit(conn)
+
+    def update_document_stat(self, doc_id: str, size_bytes: int, mtime_ns: int) -> None:
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE documents SET size_bytes=?, mtime_ns=? WHERE doc_id=?",
+                (size_bytes, mtime_ns, doc_id),
+            )
+            self._commit(conn)
 
     def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
         with self.connect() as conn:
             row = conn.execute("SELECT * FROM documents WHERE doc_id=?", (doc_id,)).fetchone()
             return dict(row) if row else None
 
+    def get_documents(self, doc_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        with self.connect() as conn:
+            for i in range(0, len(doc_ids), SQLITE_MAX_VARS):
+                batch = doc_ids[i:i + SQLITE_MAX_VARS]
+                placeholders = ",".join(["?"] * len(batch))
+                rows = conn.execute(f"SELECT * FROM documents WHERE doc_id IN ({placeholders})", tuple(batch)).fetchall()
+                for r in rows:
+                    out[r["doc_id"]] = dict(r)
+        return out
+
     def delete_document_and_chunks(self, doc_id: str) -> None:
         with self.connect() as conn:
             conn.execute("DELETE FROM chunks WHERE doc_id=?", (doc_id,))
+            conn.execute("DELETE FROM document_pages WHERE doc_id=?", (doc_id,))
             conn.execute("DELETE FROM documents WHERE doc_id=?", (doc_id,))
-            conn.commit()
+            self._commit(conn)
 
     def list_documents_by_mode(self, mode: str) -> List[Dict[str, Any]]:
         with self.connect() as conn:
@@ -89,17 +306,81 @@ class DB:
             rows = conn.execute("SELECT * FROM documents ORDER BY mode, path").fetchall()
             return [dict(r) for r in rows]
 
+    def _insert_chunks(self, conn: sqlite3.Connection, chunks: List[Tuple]) -> None:
+        # Rows are (chunk_id, doc_id, mode, chunk_hash, text, heading, page, start_char, end_char[, unit]).
+        conn.executemany(
+            """
+            INSERT INTO chunks(chunk_key, chunk_id, doc_id, mode, chunk_hash, text, heading, page, start_char, end_char, unit)
+            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            [(stable_chunk_key(c[0]), *c[:9], c[9] if len(c) > 9 else None) for c in chunks],
+        )
+
     def replace_chunks_for_doc(self, doc_id: str, chunks: List[Tuple]) -> None:
         with self.connect() as conn:
             conn.execute("DELETE FROM chunks WHERE doc_id=?", (doc_id,))
+            self._insert_chunks(conn, chunks)
+            self._commit(conn)
+
+    def replace_chunks_for_units(self, doc_id: str, units: List[int], chunks: List[Tuple]) -> None:
+        with self.connect() as conn:
+            for i in range(0, len(units), SQLITE_MAX_VARS):
+                batch = units[i:i + SQLITE_MAX_VARS]
+                placeholders = ",".join(["?"] * len(batch))
+                conn.execute(f"DELETE FROM chunks WHERE doc_id=? AND unit IN ({placeholders})", (doc_id, *batch))
+            self._insert_chunks(conn, chunks)
+            self._commit(conn)
+
+    def list_chunk_ids_for_doc(self, doc_id: str) -> List[str]:
+        with self.connect() as conn:
+            rows = conn.execute("SELECT chunk_id FROM chunks WHERE doc_id=?", (doc_id,)).fetchall()
+            return [r["chunk_id"] for r in rows]
+
+    def list_chunk_ids_for_units(self, doc_id: str, units: List[int]) -> List[str]:
+        out: List[str] = []
+        with self.connect() as conn:
+            for i in range(0, len(units), SQLITE_MAX_VARS):
+                batch = units[i:i + SQLITE_MAX_VARS]
+                placeholders = ",".join(["?"] * len(batch))
+                rows = conn.execute(
+                    f"SELECT chunk_id FROM chunks WHERE doc_id=? AND unit IN ({placeholders})",
+                    (doc_id, *batch),
+                ).fetchall()
+                out.extend(r["chunk_id"] for r in rows)
+        return out
+
+    def get_page_hashes(self, doc_ids: List[str]) -> Dict[str, Dict[int, str]]:
+        out: Dict[str, Dict[int, str]] = {}
+        with self.connect() as conn:
+            for i in range(0, len(doc_ids), SQLITE_MAX_VARS):
+                batch = doc_ids[i:i + SQLITE_MAX_VARS]
+                placeholders = ",".join(["?"] * len(batch))
+                rows = conn.execute(
+                    f"SELECT doc_id, unit, page_hash FROM document_pages WHERE doc_id IN ({placeholders})",
+                    tuple(batch),
+                ).fetchall()
+                for r in rows:
+                    out.setdefault(r["doc_id"], {})[r["unit"]] = r["page_hash"]
+        return out
+
+    def replace_document_pages(self, doc_id: str, pages: List[Tuple[int, Optional[int], str]]) -> None:
+        with self.connect() as conn:
+            conn.execute("DELETE FROM document_pages WHERE doc_id=?", (doc_id,))
             conn.executemany(
-                """
-                INSERT INTO chunks(chunk_id, doc_id, mode, chunk_hash, text, heading, page, start_char, end_char)
-                VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                chunks,
+                "INSERT INTO document_pages(doc_id, unit, page, page_hash) VALUES(?, ?, ?, ?)",
+                [(doc_id, unit, page, page_hash) for unit, page, page_hash in pages],
             )
-            conn.commit()
+            self._commit(conn)
+
+    def count_chunks_by_mode(self, mode: str) -> int:
+        with self.connect() as conn:
+            row = conn.execute("SELECT COUNT(*) AS n FROM chunks WHERE mode=?", (mode,)).fetchone()
+            return int(row["n"])
+
+    def list_chunk_ids_by_mode(self, mode: str) -> List[str]:
+        with self.connect() as conn:
+            rows = conn.execute("SELECT chunk_id FROM chunks WHERE mode=?", (mode,)).fetchall()
+            return [r["chunk_id"] for r in rows]
 
     def list_chunks_by_mode(self, mode: str) -> List[Dict[str, Any]]:
         with self.connect() as conn:
@@ -115,19 +396,83 @@ class DB:
             ).fetchall()
             return [dict(r) for r in rows]
 
-    def list_chunks_by_ids(self, chunk_ids: List[str]) -> List[Dict[str, Any]]:
-        if not chunk_ids:
+    def list_chunks_by_keys(self, chunk_keys: List[int]) -> List[Dict[str, Any]]:
+        if not chunk_keys:
             return []
-        placeholders = ",".join(["?"] * len(chunk_ids))
+        by_key: Dict[int, Dict[str, Any]] = {}
         with self.connect() as conn:
-            rows = conn.execute(
-                f"""
-                SELECT c.*, d.path AS source_path
-                FROM chunks c
-                JOIN documents d ON d.doc_id = c.doc_id
-                WHERE c.chunk_id IN ({placeholders})
-                """,
-                tuple(chunk_ids),
-            ).fetchall()
-            by_id = {r["chunk_id"]: dict(r) for r in rows}
-            return [by_id[cid] for cid in chunk_ids if cid in by_id]
\ No newline at end of file
+            for i in range(0, len(chunk_keys), SQLITE_MAX_VARS):
+                batch = chunk_keys[i:i + SQLITE_MAX_VARS]
+                placeholders = ",".join(["?"] * len(batch))
+                rows = conn.execute(
+                    f"""
+                    SELECT c.*, d.path AS source_path
+                    FROM chunks c
+                    JOIN documents d ON d.doc_id = c.doc_id
+                    WHERE c.chunk_key IN ({placeholders})
+                    """,
+                    tuple(int(k) for k in batch),
+                ).fetchall()
+                for r in rows:
+                    by_key[r["chunk_key"]] = dict(r)
+        return [by_key[k] for k in chunk_keys if k in by_key]
+
+    def get_embeddings(self, model: str, chunk_hashes: List[str]) -> Dict[str, Tuple[int, bytes]]:
+        out: Dict[str, Tuple[int, bytes]] = {}
+        if not chunk_hashes:
+            return out
+        with self.connect() as conn:
+            for i in range(0, len(chunk_hashes), SQLITE_MAX_VARS):
+                batch = chunk_hashes[i:i + SQLITE_MAX_VARS]
+                placeholders = ",".join(["?"] * len(batch))
+                rows = conn.execute(
+                    f"""
+                    SELECT chunk_hash, dim, vector FROM embeddings
+                    WHERE model=? AND chunk_hash IN ({placeholders})
+                    """,
+                    (model, *batch),
+                ).fetchall()
+                for r in rows:
+                    out[r["chunk_hash"]] = (r["dim"], r["vector"])
+        return out
+
+    def put_embeddings(self, model: str, rows: List[Tuple[str, int, bytes]]) -> None:
+        if not rows:
+            return
+        with self.connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings(model, chunk_hash, dim, vector) VALUES(?, ?, ?, ?)",
+                [(model, h, dim, blob) for h, dim, blob in rows],
+            )
+            self._commit(conn)
+
+    def gc_embeddings(self, model: Optional[str] = None) -> int:
+        sql = "DELETE FROM embeddings WHERE chunk_hash NOT IN (SELECT chunk_hash FROM chunks)"
+        params: Tuple = ()
+        if model is not None:
+            sql += " AND model=?"
+            params = (model,)
+        with self.connect() as conn:
+            cur = conn.execute(sql, params)
+            self._commit(conn)
+            return cur.rowcount
+
+    def search_chunks_fts(self, modes: List[str], match: str, limit: int) -> List[Tuple[int, str, float]]:
+        if not self.fts_enabled or not match or not modes:
+            return []
+        placeholders = ",".join(["?"] * len(modes))
+        with self.connect() as conn:
+            try:
+                rows = conn.execute(
+                    f"""
+                    SELECT rowid AS chunk_key, mode, bm25(chunks_fts) AS rank
+                    FROM chunks_fts
+                    WHERE chunks_fts MATCH ? AND mode IN ({placeholders})
+                    ORDER BY rank
+                    LIMIT ?
+                    """,
+                    (match, *modes, limit),
+                ).fetchall()
+            except sqlite3.OperationalError:
+                return []
+            return [(r["chunk_key"], r["mode"], -float(r["rank"])) for r in rows]
@@ -0,0 +1,78 @@
+import threading
+from typing import Callable, Dict, Optional
+
+from app.config import settings
+
+
+# An embedding backend is any object with SentenceTransformer's
+# encode(texts, batch_size=..., normalize_embeddings=..., show_progress_bar=...),
+# max_seq_length and get_sentence_embedding_dimension().
+
+
+def _load_torch(quantize: bool, threads: int):
+    if quantize:
+        raise ValueError("embedding_quantize is only supported by the onnx backend")
+    # Imported here so processes running another backend never load torch.
+    from sentence_transformers import SentenceTransformer
+
+    if threads > 0:
+        import torch
+
+        torch.set_num_threads(threads)
+    return SentenceTransformer(settings.embedding_model_name)
+
+
+def _load_onnx(quantize: bool, threads: int):
+    from app.onnx_encoder import OnnxEncoder
+
+    return OnnxEncoder(settings.embedding_model_name, quantize=quantize, threads=threads)
+
+
+BACKENDS: Dict[str, Callable] = {"torch": _load_torch, "onnx": _load_onnx}
+
+
+def load_backend(name: str, quantize: bool = False, threads: int = 0):
+    loader = BACKENDS.get(name)
+    if loader is None:
+        raise ValueError(f"Unknown embedding backend: {name}")
+    return loader(quantize, threads)
+
+
+def backend_variant(name: Optional[str] = None, quantize: Optional[bool] = None) -> str:
+    name = name or settings.embedding_backend
+    quantize = settings.embedding_quantize if quantize is None else quantize
+    return f"{name}-int8" if quantize else name
+
+
+def embedding_model_key() -> str:
+    # Cached chunk vectors, query caches and index metadata are keyed by this,
+    # so switching backend re-encodes rather than mixing vectors from both.
+    variant = backend_variant()
+    if variant == "torch":
+        return settings.embedding_model_name
+    return f"{settings.embedding_model_name}@{variant}"
+
+
+_model_lock = threading.Lock()
+_model: Optional[object] = None
+
+
+def get_embedding_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_backend(
+                    settings.embedding_backend,
+                    quantize=settings.embedding_quantize,
+                    threads=settings.embedding_threads,
+                )
+    return _model
+
+
+def set_embedding_model(model) -> None:
+    # Lets benchmarks install a stand-in with SentenceTransformer's encode()
+    # signature before any indexer or vector store is created.
+    global _model
+    with _model_lock:
+        _model = model
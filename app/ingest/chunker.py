@@ -1,5 +1,6 @@
 import re
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import List, Optional, Tuple
 
 
@@ -13,6 +14,10 @@ class Chunk:
 
 
 _heading_re = re.compile(r"^\s{0,3}(#{1,6})\s+(.+?)\s*$", re.MULTILINE)
+_unit_re = re.compile(r"\S.*?(?:[.!?](?=\s)|\n\s*\n|$)", re.DOTALL)
+
+# [CLS] and [SEP] are added by the model and count against its sequence limit.
+SPECIAL_TOKENS = 2
 
 
 def split_markdown_by_headings(text: str) -> List[Tuple[Optional[str], str]]:
@@ -68,11 +73,99 @@ def chunk_text(text: str, heading: Optional[str], page: Optional[int], chunk_siz
     return chunks
 
 
-def chunk_loaded_text(text: str, is_markdown: bool, page: Optional[int], chunk_size: int, overlap: int) -> List[Chunk]:
+@lru_cache(maxsize=4)
+def get_tokenizer(name: str):
+    # The Rust tokenizer alone, so chunking workers never import torch.
+    from tokenizers import Tokenizer
+
+    return Tokenizer.from_pretrained(name)
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    spans = []
+    for m in _unit_re.finditer(text):
+        start, end = m.start(), m.end()
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            spans.append((start, end))
+    return spans
+
+
+def chunk_text_tokens(
+    text: str,
+    heading: Optional[str],
+    page: Optional[int],
+    tokenizer,
+    max_tokens: int,
+    overlap_tokens: int,
+) -> List[Chunk]:
+    cleaned = re.sub(r"\n{3,}", "\n\n", text).strip()
+    if not cleaned:
+        return []
+
+    budget = max(8, max_tokens - SPECIAL_TOKENS)
+    overlap_tokens = min(overlap_tokens, budget // 2)
+    spans = sentence_spans(cleaned)
+    encodings = tokenizer.encode_batch([cleaned[s:e] for s, e in spans], add_special_tokens=False)
+
+    # Sentences longer than the budget are cut into token windows, using the
+    # tokenizer's offsets to map each window back to characters.
+    units: List[Tuple[int, int, int]] = []
+    for (s, e), enc in zip(spans, encodings):
+        n = len(enc.ids)
+        if n <= budget:
+            units.append((s, e, n))
+            continue
+        step = budget - overlap_tokens
+        for i in range(0, n, step):
+            window = enc.offsets[i:i + budget]
+            units.append((s + window[0][0], s + window[-1][1], len(window)))
+            if i + budget >= n:
+                break
+
+    chunks: List[Chunk] = []
+    i = 0
+    while i < len(units):
+        j, used = i, 0
+        while j < len(units) and (j == i or used + units[j][2] <= budget):
+            used += units[j][2]
+            j += 1
+        start, end = units[i][0], units[j - 1][1]
+        chunks.append(Chunk(text=cleaned[start:end], heading=heading, page=page, start_char=start, end_char=end))
+        if j >= len(units):
+            break
+
+        # Step back over whole trailing sentences that fit in the overlap budget,
+        # leaving room for at least the next new sentence.
+        back, carried = j, 0
+        room = min(overlap_tokens, budget - units[j][2])
+        while back - 1 > i and carried + units[back - 1][2] <= room:
+            back -= 1
+            carried += units[back][2]
+        i = back
+
+    return chunks
+
+
+def chunk_loaded_text(
+    text: str,
+    is_markdown: bool,
+    page: Optional[int],
+    chunk_size: int,
+    overlap: int,
+    tokenizer: Optional[str] = None,
+    heading: Optional[str] = None,
+) -> List[Chunk]:
+    # With a tokenizer name, chunk_size and overlap are measured in model tokens.
+    def split(body: str, block_heading: Optional[str]) -> List[Chunk]:
+        if tokenizer:
+            return chunk_text_tokens(body, block_heading, page, get_tokenizer(tokenizer), chunk_size, overlap)
+        return chunk_text(body, heading=block_heading, page=page, chunk_size=chunk_size, overlap=overlap)
+
     if is_markdown:
-        blocks = split_markdown_by_headings(text)
         out: List[Chunk] = []
-        for heading, body in blocks:
-            out.extend(chunk_text(body, heading=heading, page=page, chunk_size=chunk_size, overlap=overlap))
+        for block_heading, body in split_markdown_by_headings(text):
+            out.extend(split(body, block_heading))
         return out
-    return chunk_text(text, heading=None, page=page, chunk_size=chunk_size, overlap=overlap)
\ No newline at end of file
+    return split(text, heading)
\ No newline at end of file
@@ -0,0 +1,60 @@
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.db import DB
+
+
+class EmbeddingCache:
+    def __init__(self, db: DB, model, model_name: str, batch_size: int = 64):
+        self.db = db
+        self.model = model
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def embed(self, texts: List[str], chunk_hashes: List[str]) -> np.ndarray:
+        emb, new_rows = self.embed_deferred(texts, chunk_hashes)
+        self.db.put_embeddings(self.model_name, new_rows)
+        return emb
+
+    def embed_deferred(self, texts: List[str], chunk_hashes: List[str]) -> Tuple[np.ndarray, List[Tuple[str, int, bytes]]]:
+        unique_hashes = list(dict.fromkeys(chunk_hashes))
+        cached = self.db.get_embeddings(self.model_name, unique_hashes)
+
+        vectors: Dict[str, np.ndarray] = {}
+        for h, (dim, blob) in cached.items():
+            vec = np.frombuffer(blob, dtype="float32")
+            if vec.shape[0] == dim:
+                vectors[h] = vec
+
+        missing: Dict[str, str] = {}
+        for text, h in zip(texts, chunk_hashes):
+            if h not in vectors and h not in missing:
+                missing[h] = text
+
+        self.hits += len(unique_hashes) - len(missing)
+        self.misses += len(missing)
+
+        new_rows: List[Tuple[str, int, bytes]] = []
+        if missing:
+            miss_hashes = list(missing.keys())
+            emb = self.model.encode(
+                [missing[h] for h in miss_hashes],
+                normalize_embeddings=True,
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            emb = np.asarray(emb, dtype="float32")
+            for h, vec in zip(miss_hashes, emb):
+                vectors[h] = vec
+                new_rows.append((h, int(vec.shape[0]), vec.tobytes()))
+
+        if not chunk_hashes:
+            return np.zeros((0, 0), dtype="float32"), new_rows
+        return np.vstack([vectors[h] for h in chunk_hashes]).astype("float32", copy=False), new_rows
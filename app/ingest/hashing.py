@@ -0,0 +1,48 @@
+import hashlib
+from pathlib import Path
+from typing import Optional
+
+
+def sha256_bytes(b: bytes) -> str:
+    return hashlib.sha256(b).hexdigest()
+
+
+def sha256_text(s: str) -> str:
+    return hashlib.sha256(s.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def sha256_file(path: Path, block_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    buf = bytearray(block_size)
+    view = memoryview(buf)
+    with path.open("rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.hexdigest()
+
+
+def stable_doc_id(mode: str, path: Path) -> str:
+    return sha256_text(f"{mode}::{path.as_posix()}")
+
+
+def stable_chunk_id(doc_id: str, chunk_index: int, chunk_hash: str, unit: Optional[int] = None) -> str:
+    # chunk_index counts within the page/section `unit`, so editing one page
+    # leaves the ids of chunks on every other page unchanged.
+    if unit is None:
+        return sha256_text(f"{doc_id}::{chunk_index}::{chunk_hash}")
+    return sha256_text(f"{doc_id}::{unit}:{chunk_index}::{chunk_hash}")
+
+
+def stable_section_unit(heading: Optional[str], occurrence: int) -> int:
+    # Unpaged sections (DOCX headings, whole text files) are keyed by their heading
+    # and how many earlier sections share it, not by position, so inserting or
+    # removing a section leaves the keys of the other sections unchanged.
+    return int(sha256_text(f"{heading or ''}::{occurrence}")[:12], 16)
+
+
+def stable_chunk_key(chunk_id: str) -> int:
+    # 60 bits of the chunk id: fits SQLite's signed INTEGER PRIMARY KEY and FAISS int64 ids.
+    return int(chunk_id[:15], 16)
@@ -1,35 +1,29 @@
-import hashlib
 import json
-from dataclasses import dataclass
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 
 from app.config import settings
 from app.db import DB
-from app.ingest.loaders import load_any
-from app.ingest.chunker import chunk_loaded_text, Chunk
+from app.embeddings import embedding_model_key, get_embedding_model
+from app.ingest.embedding_cache import EmbeddingCache
+from app.ingest.hashing import sha256_file, stable_doc_id
+from app.ingest.pipeline import EmbeddedDoc, IngestJob, IngestPipeline, StageStats
+from app.metrics import chunks_embedded_total, documents_indexed_total, observe
+from app.profiling import profiled, should_profile
+from app.retrieval import index_files
+from app.retrieval.ann import build_index, effective_kind, recall_at_k, search_params, supports_remove
+from app.retrieval.vector_store import chunk_vector_id
 
 
-def sha256_bytes(b: bytes) -> str:
-    return hashlib.sha256(b).hexdigest()
-
-
-def sha256_text(s: str) -> str:
-    return hashlib.sha256(s.encode("utf-8", errors="ignore")).hexdigest()
-
-
-def stable_doc_id(mode: str, path: Path) -> str:
-    return sha256_text(f"{mode}::{path.as_posix()}")
-
-
-def stable_chunk_id(doc_id: str, chunk_index: int, chunk_hash: str) -> str:
-    return sha256_text(f"{doc_id}::{chunk_index}::{chunk_hash}")
-
+SOURCE_SUFFIXES = {".txt", ".md", ".markdown", ".pdf", ".docx"}
 
 @dataclass
 class IndexBuildStats:
@@ -38,12 +32,95 @@ class IndexBuildStats:
     indexed_files: int
     deleted_files: int
     total_chunks: int
+    hashed_files: int = 0
+    added_vectors: int = 0
+    removed_vectors: int = 0
+    full_rebuild: bool = False
+    embedding_cache_hits: int = 0
+    embedding_cache_misses: int = 0
+    stage_throughput: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    index_kind: Optional[str] = None
+    recall_at_k: Optional[float] = None
+    changed_pages: int = 0
+    reused_pages: int = 0
+    profile: Optional[str] = None
+
+
+def chunking_params() -> Dict:
+    if settings.chunking == "tokens":
+        return {
+            "chunk_size": settings.chunk_max_tokens,
+            "overlap": settings.chunk_overlap_tokens,
+            "tokenizer": settings.embedding_model_name,
+        }
+    if settings.chunking != "chars":
+        raise ValueError(f"Unknown chunking: {settings.chunking}")
+    return {"chunk_size": settings.chunk_size_chars, "overlap": settings.chunk_overlap_chars, "tokenizer": None}
+
+
+class IndexCancelled(Exception):
+    pass
+
+
+@dataclass
+class IndexProgress:
+    stage: str = "queued"
+    mode: Optional[str] = None
+    files_total: int = 0
+    files_scanned: int = 0
+    files_to_index: int = 0
+    files_indexed: int = 0
+    chunks_embedded: int = 0
+    embed_started_at: Optional[float] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def advance(self, **counts: int) -> None:
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise IndexCancelled("reindex cancelled")
+
+    def eta_seconds(self) -> Optional[float]:
+        if self.embed_started_at is None or self.files_indexed == 0:
+            return None
+        elapsed = time.monotonic() - self.embed_started_at
+        remaining = max(0, self.files_to_index - self.files_indexed)
+        return round(elapsed / self.files_indexed * remaining, 1)
+
+    def as_dict(self) -> Dict:
+        return {
+            "stage": self.stage,
+            "mode": self.mode,
+            "files_total": self.files_total,
+            "files_scanned": self.files_scanned,
+            "files_to_index": self.files_to_index,
+            "files_indexed": self.files_indexed,
+            "chunks_embedded": self.chunks_embedded,
+            "eta_seconds": self.eta_seconds(),
+        }
 
 
 class POSIndexer:
     def __init__(self, db: DB):
         self.db = db
-        self.model = SentenceTransformer(settings.embedding_model_name)
+        self.model = get_embedding_model()
+        self.embedding_cache = EmbeddingCache(
+            db, self.model, embedding_model_key(), batch_size=settings.embed_batch_size
+        )
+        chunking = chunking_params()
+        # Stored per document so changing the chunking settings re-chunks every file.
+        self.chunker = f"{settings.chunking}:{chunking['chunk_size']}:{chunking['overlap']}:{chunking['tokenizer'] or ''}"
+        self.pipeline = IngestPipeline(
+            embedding_cache=self.embedding_cache,
+            workers=settings.ingest_workers,
+            queue_depth=settings.ingest_queue_depth,
+            embed_batch_size=settings.embed_batch_size,
+            **chunking,
+        )
 
     def ensure_dirs(self) -> None:
         settings.sources_dir.mkdir(parents=True, exist_ok=True)
@@ -55,119 +132,371 @@ class POSIndexer:
 
     def list_source_files(self, mode: str) -> List[Path]:
         root = settings.sources_dir / mode
-        allowed = {".txt", ".md", ".markdown", ".pdf", ".docx"}
         files = []
         for p in root.rglob("*"):
-            if p.is_file() and p.suffix.lower() in allowed:
+            if p.is_file() and p.suffix.lower() in SOURCE_SUFFIXES:
                 files.append(p)
         files.sort()
         return files
 
     def compute_file_hash(self, path: Path) -> str:
-        return sha256_bytes(path.read_bytes())
-
-    def index_mode(self, mode: str) -> IndexBuildStats:
+        return sha256_file(path, block_size=settings.hash_block_size)
+
+    def compute_file_hashes(self, paths: List[Path], progress: Optional[IndexProgress] = None) -> List[str]:
+        def hash_one(path: Path) -> str:
+            if progress is not None:
+                progress.check_cancelled()
+            h = self.compute_file_hash(path)
+            if progress is not None:
+                progress.advance(files_scanned=1)
+            return h
+
+        if len(paths) < 2 or settings.hash_workers <= 1:
+            return [hash_one(p) for p in paths]
+        with ThreadPoolExecutor(max_workers=settings.hash_workers) as pool:
+            return list(pool.map(hash_one, paths))
+
+    def index_mode(
+        self,
+        mode: str,
+        compact: bool = False,
+        progress: Optional[IndexProgress] = None,
+        profile: bool = False,
+    ) -> IndexBuildStats:
+        with profiled(f"index-{mode}", should_profile(profile)) as prof:
+            self.ensure_dirs()
+            files = self.list_source_files(mode)
+            known_docs = self.db.list_documents_by_mode(mode)
+            current_paths = {p.as_posix() for p in files}
+            gone = [d for d in known_docs if d["path"] not in current_paths]
+            stats = self._index_files(mode, files, known_docs, gone, compact=compact, progress=progress)
+        stats.profile = str(prof.path) if prof.path is not None else None
+        return stats
+
+    def index_paths(self, mode: str, paths: Iterable[Path], progress: Optional[IndexProgress] = None) -> IndexBuildStats:
         self.ensure_dirs()
+        files: Set[Path] = set()
+        missing: List[str] = []
+        for p in paths:
+            if p.is_dir():
+                files.update(q for q in p.rglob("*") if q.is_file() and q.suffix.lower() in SOURCE_SUFFIXES)
+            elif p.is_file():
+                if p.suffix.lower() in SOURCE_SUFFIXES:
+                    files.add(p)
+            else:
+                missing.append(p.as_posix())
+
+        ordered = sorted(files)
+        # Only the documents being touched are looked up; the whole mode is read
+        # just when a missing path has to be matched against stored paths.
+        known_docs = list(self.db.get_documents([stable_doc_id(mode, p) for p in ordered]).values())
+        gone = []
+        if missing:
+            gone = [
+                d for d in self.db.list_documents_by_mode(mode)
+                if any(d["path"] == m or d["path"].startswith(m + "/") for m in missing)
+            ]
+        return self._index_files(mode, ordered, known_docs, gone, progress=progress)
+
+    def _index_files(
+        self,
+        mode: str,
+        files: List[Path],
+        known_docs: List[Dict],
+        gone: List[Dict],
+        compact: bool = False,
+        progress: Optional[IndexProgress] = None,
+    ) -> IndexBuildStats:
+        progress = progress or IndexProgress()
+        progress.mode = mode
+        progress.stage = "scanning"
+        self.embedding_cache.reset_stats()
         now = datetime.utcnow().isoformat()
 
-        files = self.list_source_files(mode)
         scanned = len(files)
+        progress.advance(files_total=scanned)
 
-        known_docs = self.db.list_documents_by_mode(mode)
-        known_by_path = {d["path"]: d for d in known_docs}
+        known_by_id = {d["doc_id"]: d for d in known_docs}
 
-        current_paths = {p.as_posix() for p in files}
-        deleted = 0
-        for old_path, doc in list(known_by_path.items()):
-            if old_path not in current_paths:
-                self.db.delete_document_and_chunks(doc["doc_id"])
-                deleted += 1
-
-        indexed = 0
-        total_chunks = 0
+        removed_chunk_ids: List[str] = []
+        added_rows: List[Tuple] = []
 
+        t0 = time.perf_counter()
+        candidates = []
         for path in files:
-            pstr = path.as_posix()
             doc_id = stable_doc_id(mode, path)
-            file_hash = self.compute_file_hash(path)
-            existing = self.db.get_document(doc_id)
-
-            if existing and existing["file_hash"] == file_hash:
+            st = path.stat()
+            existing = known_by_id.get(doc_id)
+            if (
+                existing
+                and existing.get("chunker") == self.chunker
+                and existing.get("size_bytes") == st.st_size
+                and existing.get("mtime_ns") == st.st_mtime_ns
+            ):
                 continue
+            candidates.append((path, doc_id, existing, st))
+        progress.advance(files_scanned=scanned - len(candidates))
 
-            pages = load_any(path)
-            is_md = path.suffix.lower() in [".md", ".markdown"]
-            all_chunks: List[Chunk] = []
-            for lp in pages:
-                all_chunks.extend(
-                    chunk_loaded_text(
-                        text=lp.text,
-                        is_markdown=is_md,
-                        page=lp.page,
-                        chunk_size=settings.chunk_size_chars,
-                        overlap=settings.chunk_overlap_chars,
-                    )
-                )
+        file_hashes = self.compute_file_hashes([c[0] for c in candidates], progress)
 
-            db_rows: List[Tuple] = []
-            for idx, ch in enumerate(all_chunks):
-                ch_hash = sha256_text(ch.text)
-                chunk_id = stable_chunk_id(doc_id, idx, ch_hash)
-                db_rows.append(
-                    (
-                        chunk_id,
-                        doc_id,
-                        mode,
-                        ch_hash,
-                        ch.text,
-                        ch.heading,
-                        ch.page,
-                        ch.start_char,
-                        ch.end_char,
-                    )
+        jobs: List[IngestJob] = []
+        touched: List[Tuple[str, int, int]] = []
+        for (path, doc_id, existing, st), file_hash in zip(candidates, file_hashes):
+            if existing and existing["file_hash"] == file_hash and existing.get("chunker") == self.chunker:
+                touched.append((doc_id, st.st_size, st.st_mtime_ns))
+                continue
+            jobs.append(
+                IngestJob(
+                    path=path,
+                    doc_id=doc_id,
+                    file_hash=file_hash,
+                    existed=existing is not None,
+                    size_bytes=st.st_size,
+                    mtime_ns=st.st_mtime_ns,
                 )
-
-            self.db.upsert_document(doc_id=doc_id, mode=mode, path=pstr, file_hash=file_hash, updated_at=now)
-            self.db.replace_chunks_for_doc(doc_id, db_rows)
-
+            )
+        reusable = [j.doc_id for j in jobs if j.existed and known_by_id[j.doc_id].get("chunker") == self.chunker]
+        page_hashes = self.db.get_page_hashes(reusable)
+        for j in jobs:
+            j.known_pages = page_hashes.get(j.doc_id, {})
+        hash_stage = StageStats(items=len(candidates), units=len(jobs), busy_seconds=time.perf_counter() - t0)
+        observe("index", "hash", hash_stage.busy_seconds)
+        progress.advance(files_to_index=len(jobs))
+        progress.check_cancelled()
+
+        added_vectors: List[np.ndarray] = []
+        indexed = 0
+        page_counts = {"changed": 0, "reused": 0}
+
+        def write(doc: EmbeddedDoc) -> None:
+            nonlocal indexed
+            progress.check_cancelled()
+            job = doc.job
+            if doc.changed_units is None:
+                stale_units = None
+                old_ids = set(self.db.list_chunk_ids_for_doc(job.doc_id)) if job.existed else set()
+            else:
+                # Only pages whose text changed, or that disappeared, lose their chunks.
+                stale_units = doc.changed_units | (set(job.known_pages) - {u for u, _, _ in doc.pages})
+                old_ids = set(self.db.list_chunk_ids_for_units(job.doc_id, sorted(stale_units)))
+            new_ids = {r[0] for r in doc.rows}
+            removed_chunk_ids.extend(old_ids - new_ids)
+            for row, vec in zip(doc.rows, doc.vectors):
+                if row[0] not in old_ids:
+                    added_rows.append(row)
+                    added_vectors.append(vec)
+
+            self.db.put_embeddings(self.embedding_cache.model_name, doc.cache_rows)
+            self.db.upsert_document(
+                doc_id=job.doc_id,
+                mode=mode,
+                path=job.path.as_posix(),
+                file_hash=job.file_hash,
+                updated_at=now,
+                size_bytes=job.size_bytes,
+                mtime_ns=job.mtime_ns,
+                chunker=self.chunker,
+            )
+            if stale_units is None:
+                self.db.replace_chunks_for_doc(job.doc_id, doc.rows)
+            else:
+                self.db.replace_chunks_for_units(job.doc_id, sorted(stale_units), doc.rows)
+            self.db.replace_document_pages(job.doc_id, doc.pages)
             indexed += 1
-            total_chunks += len(db_rows)
+            changed = len(doc.pages) if doc.changed_units is None else len(doc.changed_units)
+            page_counts["changed"] += changed
+            page_counts["reused"] += len(doc.pages) - changed
+            progress.advance(files_indexed=1, chunks_embedded=len(doc.rows))
 
-        self._rebuild_faiss_index(mode)
+        deleted = 0
+        with self.db.transaction():
+            for doc in gone:
+                removed_chunk_ids.extend(self.db.list_chunk_ids_for_doc(doc["doc_id"]))
+                self.db.delete_document_and_chunks(doc["doc_id"])
+                deleted += 1
 
-        mode_chunks = self.db.list_chunks_by_mode(mode)
-        total_chunks_mode = len(mode_chunks)
+            for doc_id, size_bytes, mtime_ns in touched:
+                self.db.update_document_stat(doc_id, size_bytes, mtime_ns)
+
+            progress.stage = "embedding"
+            if progress.embed_started_at is None:
+                progress.embed_started_at = time.monotonic()
+            stages = self.pipeline.run(mode, jobs, write)
+        stages["hash"] = hash_stage
+        # Rebuilding the index below re-reads every vector through the cache;
+        # those reads are not part of this run's embedding work.
+        cache_hits, cache_misses = self.embedding_cache.hits, self.embedding_cache.misses
+        documents_indexed_total.inc(indexed, mode=mode)
+        chunks_embedded_total.inc(stages["write"].units, mode=mode)
+
+        # The database changes are committed at this point, so the index is brought
+        # in line with them even if a cancel arrives now.
+        progress.stage = "indexing"
+
+        total_chunks_mode = self.db.count_chunks_by_mode(mode)
+        t0 = time.perf_counter()
+        full_rebuild, index_meta = self._update_faiss_index(
+            mode,
+            removed_chunk_ids=removed_chunk_ids,
+            added_rows=added_rows,
+            added_vectors=np.vstack(added_vectors) if added_vectors else None,
+            expected_total=total_chunks_mode,
+            compact=compact,
+        )
+        stages["index"] = StageStats(
+            items=total_chunks_mode if full_rebuild else len(added_rows) + len(removed_chunk_ids),
+            busy_seconds=time.perf_counter() - t0,
+        )
+        observe("index", "index_write", stages["index"].busy_seconds)
 
         return IndexBuildStats(
             mode=mode,
             scanned_files=scanned,
+            hashed_files=len(candidates),
             indexed_files=indexed,
             deleted_files=deleted,
             total_chunks=total_chunks_mode,
+            added_vectors=len(added_rows),
+            removed_vectors=len(removed_chunk_ids),
+            full_rebuild=full_rebuild,
+            embedding_cache_hits=cache_hits,
+            embedding_cache_misses=cache_misses,
+            stage_throughput={name: st.as_dict() for name, st in stages.items()},
+            index_kind=index_meta.get("kind") if index_meta else None,
+            recall_at_k=index_meta.get("recall_at_k") if index_meta else None,
+            changed_pages=page_counts["changed"],
+            reused_pages=page_counts["reused"],
         )
 
-    def _rebuild_faiss_index(self, mode: str) -> None:
+    def _embed(self, texts: List[str], chunk_hashes: List[str]) -> np.ndarray:
+        return self.embedding_cache.embed(texts, chunk_hashes)
+
+    def gc_embeddings(self) -> int:
+        return self.db.gc_embeddings()
+
+    def _write_index(self, mode: str, index, chunk_ids: List[str], meta: Dict) -> None:
+        # Each build goes to a fresh version directory; readers only see it once the
+        # CURRENT pointer is swapped, so they never load a half-written pair.
+        version_dir = index_files.new_version_dir(mode)
+        meta["version"] = version_dir.name
+        faiss.write_index(index, str(version_dir / index_files.INDEX_FILE))
+        index_files.write_bundle(version_dir, chunk_ids, meta)
+        index_files.publish(mode, version_dir)
+        index_files.prune(mode, keep=settings.index_keep_versions)
+
+    def _clear_index(self, mode: str) -> None:
+        index_files.unpublish(mode)
+        index_files.prune(mode, keep=settings.index_keep_versions)
+
+    def _load_index_for_update(self, mode: str) -> Optional[Tuple[object, List[str], Dict]]:
+        current = index_files.current_dir(mode)
+        if current is None:
+            return None
+        faiss_path = current / index_files.INDEX_FILE
+        meta_path = current / index_files.META_FILE
+        if not faiss_path.exists() or not meta_path.exists():
+            return None
+        index = faiss.read_index(str(faiss_path))
+        if not isinstance(index, faiss.IndexIDMap2):
+            return None
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("model") != self.embedding_cache.model_name:
+            return None
+        chunk_ids = index_files.read_chunk_ids(current)
+        return index, chunk_ids, meta
+
+    def _update_faiss_index(
+        self,
+        mode: str,
+        removed_chunk_ids: List[str],
+        added_rows: List[Tuple],
+        added_vectors: Optional[np.ndarray],
+        expected_total: int,
+        compact: bool = False,
+    ) -> Tuple[bool, Optional[Dict]]:
+        if expected_total == 0:
+            self._clear_index(mode)
+            return False, None
+
+        loaded = None if compact else self._load_index_for_update(mode)
+        if loaded is None:
+            return True, self._rebuild_faiss_index(mode)
+
+        index, chunk_ids, meta = loaded
+        kind = meta.get("kind", "flat")
+        if kind != effective_kind(settings.index_config(mode), expected_total):
+            return True, self._rebuild_faiss_index(mode)
+
+        if not removed_chunk_ids and not added_rows:
+            if index.ntotal == expected_total and self._in_sync(mode, chunk_ids):
+                return False, meta
+            return True, self._rebuild_faiss_index(mode)
+
+        removed_since_compact = int(meta.get("removed_since_compact", 0)) + len(removed_chunk_ids)
+        if removed_since_compact > settings.index_compact_ratio * max(expected_total, 1):
+            return True, self._rebuild_faiss_index(mode)
+        if removed_chunk_ids and not supports_remove(kind):
+            return True, self._rebuild_faiss_index(mode)
+
+        if removed_chunk_ids:
+            vec_ids = np.asarray([chunk_vector_id(cid) for cid in removed_chunk_ids], dtype="int64")
+            index.remove_ids(vec_ids)
+        if added_rows:
+            emb = added_vectors if added_vectors is not None else self._embed([r[4] for r in added_rows], [r[3] for r in added_rows])
+            if emb.shape[1] != index.d:
+                return True, self._rebuild_faiss_index(mode)
+            vec_ids = np.asarray([chunk_vector_id(r[0]) for r in added_rows], dtype="int64")
+            index.add_with_ids(emb, vec_ids)
+
+        removed = set(removed_chunk_ids)
+        chunk_ids = [cid for cid in chunk_ids if cid not in removed]
+        chunk_ids.extend(r[0] for r in added_rows)
+
+        if index.ntotal != expected_total or not self._in_sync(mode, chunk_ids):
+            return True, self._rebuild_faiss_index(mode)
+
+        meta.update({"ntotal": int(index.ntotal), "removed_since_compact": removed_since_compact})
+        self._write_index(mode, index, chunk_ids, meta)
+        return False, meta
+
+    def _in_sync(self, mode: str, chunk_ids: List[str]) -> bool:
+        # The index is updated after the database commits, so a failed update leaves
+        # it behind; matching counts alone would miss that once an edit keeps the
+        # chunk count the same.
+        db_ids = self.db.list_chunk_ids_by_mode(mode)
+        return len(chunk_ids) == len(db_ids) and set(chunk_ids) == set(db_ids)
+
+    def _rebuild_faiss_index(self, mode: str) -> Optional[Dict]:
         chunks = self.db.list_chunks_by_mode(mode)
-        faiss_dir = settings.index_dir / "faiss" / mode
-        faiss_path = faiss_dir / "index.faiss"
-        ids_path = faiss_dir / "chunk_ids.json"
 
         if not chunks:
-            if faiss_path.exists():
-                faiss_path.unlink()
-            if ids_path.exists():
-                ids_path.unlink()
-            return
+            self._clear_index(mode)
+            return None
 
         texts = [c["text"] for c in chunks]
         chunk_ids = [c["chunk_id"] for c in chunks]
 
-        emb = self.model.encode(texts, normalize_embeddings=True, batch_size=64, show_progress_bar=False)
-        emb = np.asarray(emb, dtype="float32")
-
-        dim = emb.shape[1]
-        index = faiss.IndexFlatIP(dim)
-        index.add(emb)
-
-        faiss.write_index(index, str(faiss_path))
-        ids_path.write_text(json.dumps(chunk_ids, indent=2), encoding="utf-8")
\ No newline at end of file
+        emb = self._embed(texts, [c["chunk_hash"] for c in chunks])
+        vec_ids = np.asarray([c["chunk_key"] for c in chunks], dtype="int64")
+
+        cfg = settings.index_config(mode)
+        index, kind, spec = build_index(cfg, emb, vec_ids)
+
+        recall = None
+        if kind != "flat":
+            params = search_params(kind, nprobe=cfg.nprobe, ef_search=cfg.ef_search)
+            recall = recall_at_k(index, emb, vec_ids, k=cfg.recall_k, n_queries=cfg.recall_queries, params=params)
+
+        meta = {
+            "model": self.embedding_cache.model_name,
+            "dim": int(emb.shape[1]),
+            "kind": kind,
+            "factory": spec,
+            "ntotal": int(index.ntotal),
+            "removed_since_compact": 0,
+            "recall_at_k": recall,
+            "recall_k": cfg.recall_k if recall is not None else None,
+            "built_at": datetime.utcnow().isoformat(),
+        }
+        self._write_index(mode, index, chunk_ids, meta)
+        return meta
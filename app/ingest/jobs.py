@@ -0,0 +1,148 @@
+import queue
+import threading
+import traceback
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.ingest.indexer import IndexCancelled, IndexProgress, POSIndexer
+
+
+TERMINAL = ("succeeded", "failed", "cancelled")
+
+
+@dataclass
+class ReindexJob:
+    job_id: str
+    modes: List[str]
+    compact: bool = False
+    gc_embeddings: bool = False
+    paths: Optional[List[str]] = None  # only these files/dirs, for watcher-triggered jobs
+    profile: bool = False
+    status: str = "queued"  # queued | running | succeeded | failed | cancelled
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    modes_done: List[str] = field(default_factory=list)
+    stats: List[Dict[str, Any]] = field(default_factory=list)
+    embeddings_removed: Optional[int] = None
+    error: Optional[str] = None
+    progress: IndexProgress = field(default_factory=IndexProgress)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "modes": self.modes,
+            "compact": self.compact,
+            "gc_embeddings": self.gc_embeddings,
+            "paths": self.paths,
+            "profile": self.profile,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "modes_done": list(self.modes_done),
+            "progress": self.progress.as_dict(),
+            "stats": list(self.stats),
+            "embeddings_removed": self.embeddings_removed,
+            "error": self.error,
+        }
+
+
+class ReindexJobManager:
+    def __init__(self, indexer: POSIndexer, history: int = 50):
+        self.indexer = indexer
+        self.history = max(1, history)
+        self._jobs: "OrderedDict[str, ReindexJob]" = OrderedDict()
+        self._queue: "queue.Queue[ReindexJob]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="reindex-jobs", daemon=True)
+                self._thread.start()
+
+    def submit(
+        self,
+        modes: List[str],
+        compact: bool = False,
+        gc_embeddings: bool = False,
+        paths: Optional[List[Path]] = None,
+        profile: bool = False,
+    ) -> ReindexJob:
+        job = ReindexJob(
+            job_id=uuid.uuid4().hex,
+            modes=list(modes),
+            compact=compact,
+            gc_embeddings=gc_embeddings,
+            paths=[p.as_posix() for p in paths] if paths is not None else None,
+            profile=profile,
+        )
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._trim()
+        self._ensure_started()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ReindexJob]:
+        return self._jobs.get(job_id)
+
+    def recent(self) -> List[ReindexJob]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[ReindexJob]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if job.status not in TERMINAL:
+            job.progress.cancel_event.set()
+        return job
+
+    def _trim(self) -> None:
+        finished = [jid for jid, j in self._jobs.items() if j.status in TERMINAL]
+        while len(self._jobs) > self.history and finished:
+            self._jobs.pop(finished.pop(0), None)
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job.progress.cancel_event.is_set():
+                self._finish(job, "cancelled")
+                continue
+            job.status = "running"
+            job.started_at = datetime.utcnow().isoformat()
+            try:
+                for m in job.modes:
+                    job.progress.check_cancelled()
+                    if job.paths is not None:
+                        st = self.indexer.index_paths(m, [Path(p) for p in job.paths], progress=job.progress)
+                    else:
+                        st = self.indexer.index_mode(m, compact=job.compact, progress=job.progress, profile=job.profile)
+                    job.stats.append(st.__dict__)
+                    job.modes_done.append(m)
+                if job.gc_embeddings:
+                    job.embeddings_removed = self.indexer.gc_embeddings()
+            except IndexCancelled:
+                self._finish(job, "cancelled")
+            except Exception as exc:
+                traceback.print_exc()
+                job.error = f"{type(exc).__name__}: {exc}"
+                self._finish(job, "failed")
+            else:
+                self._finish(job, "succeeded")
+
+    def _finish(self, job: ReindexJob, status: str) -> None:
+        job.status = status
+        job.progress.stage = status
+        job.finished_at = datetime.utcnow().isoformat()
+        with self._lock:
+            self._trim()
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 from pypdf import PdfReader
 from docx import Document
@@ -13,23 +13,32 @@ class LoadedPage:
     heading: Optional[str] = None
 
 
-def load_txt_or_md(path: Path) -> List[LoadedPage]:
+def iter_txt_or_md(path: Path) -> Iterator[LoadedPage]:
     text = path.read_text(encoding="utf-8", errors="ignore")
-    return [LoadedPage(text=text, page=None, heading=None)]
+    yield LoadedPage(text=text, page=None, heading=None)
 
 
-def load_docx(path: Path) -> List[LoadedPage]:
+def iter_docx(path: Path) -> Iterator[LoadedPage]:
+    # DOCX has no pages; split on heading paragraphs so each section can be
+    # hashed and re-indexed on its own.
     doc = Document(str(path))
-    parts = []
+    heading: Optional[str] = None
+    parts: List[str] = []
     for p in doc.paragraphs:
-        if p.text and p.text.strip():
-            parts.append(p.text.strip())
-    return [LoadedPage(text="\n".join(parts), page=None, heading=None)]
-
-
-def load_pdf(path: Path) -> List[LoadedPage]:
+        text = p.text.strip() if p.text else ""
+        style = p.style.name if p.style is not None else ""
+        if text and (style.startswith("Heading") or style == "Title"):
+            if parts:
+                yield LoadedPage(text="\n".join(parts), page=None, heading=heading)
+            heading, parts = text, []
+        elif text:
+            parts.append(text)
+    if parts:
+        yield LoadedPage(text="\n".join(parts), page=None, heading=heading)
+
+
+def iter_pdf(path: Path) -> Iterator[LoadedPage]:
     reader = PdfReader(str(path))
-    pages: List[LoadedPage] = []
     for i, page in enumerate(reader.pages):
         try:
             txt = page.extract_text() or ""
@@ -37,16 +46,17 @@ def load_pdf(path: Path) -> List[LoadedPage]:
             txt = ""
         txt = txt.strip()
         if txt:
-            pages.append(LoadedPage(text=txt, page=i + 1, heading=None))
-    return pages
+            yield LoadedPage(text=txt, page=i + 1, heading=None)
 
 
-def load_any(path: Path) -> List[LoadedPage]:
+def iter_pages(path: Path) -> Iterator[LoadedPage]:
     suffix = path.suffix.lower()
-    if suffix in [".txt", ".md", ".markdown"]:
-        return load_txt_or_md(path)
     if suffix == ".pdf":
-        return load_pdf(path)
+        return iter_pdf(path)
     if suffix == ".docx":
-        return load_docx(path)
-    return load_txt_or_md(path)
+        return iter_docx(path)
+    return iter_txt_or_md(path)
+
+
+def load_any(path: Path) -> List[LoadedPage]:
+    return list(iter_pages(path))
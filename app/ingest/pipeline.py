@@ -0,0 +1,302 @@
+import multiprocessing
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.ingest.chunker import chunk_loaded_text
+from app.ingest.embedding_cache import EmbeddingCache
+from app.ingest.hashing import sha256_text, stable_chunk_id, stable_section_unit
+from app.ingest.loaders import iter_pages
+from app.metrics import observe, span
+
+
+@dataclass
+class IngestJob:
+    path: Path
+    doc_id: str
+    file_hash: str
+    existed: bool
+    size_bytes: Optional[int] = None
+    mtime_ns: Optional[int] = None
+    known_pages: Dict[int, str] = field(default_factory=dict)  # unit -> page hash from the last run
+
+
+@dataclass
+class PreparedDoc:
+    job: IngestJob
+    rows: List[Tuple]
+    seconds: float
+    pages: List[Tuple[int, Optional[int], str]] = field(default_factory=list)  # (unit, page, page_hash)
+    changed_units: Optional[Set[int]] = None  # None when every unit was re-chunked
+    load_seconds: float = 0.0  # part of `seconds` spent extracting text
+
+
+@dataclass
+class EmbeddedDoc:
+    job: IngestJob
+    rows: List[Tuple]
+    vectors: np.ndarray
+    cache_rows: List[Tuple[str, int, bytes]]
+    pages: List[Tuple[int, Optional[int], str]] = field(default_factory=list)
+    changed_units: Optional[Set[int]] = None
+
+
+@dataclass
+class StageStats:
+    items: int = 0
+    units: int = 0
+    busy_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        rate = self.items / self.busy_seconds if self.busy_seconds > 0 else 0.0
+        return {
+            "items": self.items,
+            "units": self.units,
+            "busy_seconds": round(self.busy_seconds, 4),
+            "items_per_second": round(rate, 2),
+        }
+
+
+@dataclass
+class _Failure:
+    exc: BaseException
+
+
+_DONE = object()
+
+
+def prepare_document(mode: str, job: IngestJob, chunk_size: int, overlap: int, tokenizer: Optional[str] = None) -> PreparedDoc:
+    # Pages (PDF) or sections (DOCX) are pulled from the loader one at a time and
+    # only re-chunked when their text hash differs from the last indexed run. The
+    # document's rows are still collected and handed on as a whole.
+    t0 = time.perf_counter()
+    is_md = job.path.suffix.lower() in [".md", ".markdown"]
+    rows: List[Tuple] = []
+    pages: List[Tuple[int, Optional[int], str]] = []
+    changed: Set[int] = set()
+    load_seconds = 0.0
+    headings_seen: Counter = Counter()
+    page_iter = iter_pages(job.path)
+    while True:
+        t1 = time.perf_counter()
+        lp = next(page_iter, None)
+        load_seconds += time.perf_counter() - t1
+        if lp is None:
+            break
+        if lp.page is not None:
+            unit = lp.page
+        else:
+            unit = stable_section_unit(lp.heading, headings_seen[lp.heading])
+            headings_seen[lp.heading] += 1
+        page_hash = sha256_text(f"{lp.heading or ''}\n{lp.text}")
+        pages.append((unit, lp.page, page_hash))
+        if job.known_pages.get(unit) == page_hash:
+            continue
+        changed.add(unit)
+        chunks = chunk_loaded_text(
+            text=lp.text,
+            is_markdown=is_md,
+            page=lp.page,
+            chunk_size=chunk_size,
+            overlap=overlap,
+            tokenizer=tokenizer,
+            heading=lp.heading,
+        )
+        for idx, ch in enumerate(chunks):
+            ch_hash = sha256_text(ch.text)
+            rows.append(
+                (
+                    stable_chunk_id(job.doc_id, idx, ch_hash, unit=unit),
+                    job.doc_id,
+                    mode,
+                    ch_hash,
+                    ch.text,
+                    ch.heading,
+                    ch.page,
+                    ch.start_char,
+                    ch.end_char,
+                    unit,
+                )
+            )
+    return PreparedDoc(
+        job=job,
+        rows=rows,
+        seconds=time.perf_counter() - t0,
+        pages=pages,
+        changed_units=changed if job.known_pages else None,
+        load_seconds=load_seconds,
+    )
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class IngestPipeline:
+    def __init__(
+        self,
+        embedding_cache: EmbeddingCache,
+        workers: int,
+        queue_depth: int,
+        embed_batch_size: int,
+        chunk_size: int,
+        overlap: int,
+        tokenizer: Optional[str] = None,
+    ):
+        self.embedding_cache = embedding_cache
+        self.workers = workers
+        self.queue_depth = max(1, queue_depth)
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.tokenizer = tokenizer
+
+    def run(self, mode: str, jobs: List[IngestJob], write: Callable[[EmbeddedDoc], None]) -> Dict[str, StageStats]:
+        stats = {"load_chunk": StageStats(), "embed": StageStats(), "write": StageStats()}
+        if not jobs:
+            return stats
+
+        stop = threading.Event()
+        prepared_q: queue.Queue = queue.Queue(maxsize=self.queue_depth)
+        embedded_q: queue.Queue = queue.Queue(maxsize=self.queue_depth)
+
+        loader = threading.Thread(target=self._load_stage, args=(mode, jobs, prepared_q, stop, stats["load_chunk"]), daemon=True)
+        embedder = threading.Thread(target=self._embed_stage, args=(prepared_q, embedded_q, stop, stats["embed"]), daemon=True)
+        loader.start()
+        embedder.start()
+
+        try:
+            while True:
+                item = embedded_q.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Failure):
+                    raise item.exc
+                t0 = time.perf_counter()
+                write(item)
+                elapsed = time.perf_counter() - t0
+                observe("index", "db_write", elapsed)
+                stats["write"].busy_seconds += elapsed
+                stats["write"].items += 1
+                stats["write"].units += len(item.rows)
+        finally:
+            stop.set()
+            loader.join()
+            embedder.join()
+        return stats
+
+    def _load_stage(self, mode: str, jobs: List[IngestJob], out: queue.Queue, stop: threading.Event, st: StageStats) -> None:
+        try:
+            if self.workers <= 0 or len(jobs) < 2:
+                for job in jobs:
+                    if stop.is_set():
+                        return
+                    doc = prepare_document(mode, job, self.chunk_size, self.overlap, self.tokenizer)
+                    self._record_load(st, doc)
+                    if not _put(out, doc, stop):
+                        return
+            else:
+                ctx = multiprocessing.get_context("spawn")
+                workers = min(self.workers, len(jobs))
+                with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                    pending: Deque = deque()
+                    it = iter(jobs)
+                    window = workers + self.queue_depth
+                    for job in it:
+                        pending.append(pool.submit(prepare_document, mode, job, self.chunk_size, self.overlap, self.tokenizer))
+                        if len(pending) >= window:
+                            break
+                    while pending:
+                        doc = pending.popleft().result()
+                        if stop.is_set():
+                            for f in pending:
+                                f.cancel()
+                            return
+                        nxt = next(it, None)
+                        if nxt is not None:
+                            pending.append(pool.submit(prepare_document, mode, nxt, self.chunk_size, self.overlap, self.tokenizer))
+                        self._record_load(st, doc)
+                        if not _put(out, doc, stop):
+                            return
+            _put(out, _DONE, stop)
+        except BaseException as exc:
+            _put(out, _Failure(exc), stop)
+
+    @staticmethod
+    def _record_load(st: StageStats, doc: PreparedDoc) -> None:
+        st.items += 1
+        st.units += len(doc.rows)
+        st.busy_seconds += doc.seconds
+        observe("index", "load", doc.load_seconds)
+        observe("index", "chunk", doc.seconds - doc.load_seconds)
+
+    def _embed_stage(self, inp: queue.Queue, out: queue.Queue, stop: threading.Event, st: StageStats) -> None:
+        batch: List[PreparedDoc] = []
+        batch_rows = 0
+        try:
+            while not stop.is_set():
+                try:
+                    item = inp.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if isinstance(item, _Failure):
+                    _put(out, item, stop)
+                    return
+                if item is _DONE:
+                    break
+                batch.append(item)
+                batch_rows += len(item.rows)
+                if batch_rows >= self.embed_batch_size or inp.empty():
+                    if not self._flush(batch, out, stop, st):
+                        return
+                    batch, batch_rows = [], 0
+            if batch and not self._flush(batch, out, stop, st):
+                return
+            _put(out, _DONE, stop)
+        except BaseException as exc:
+            _put(out, _Failure(exc), stop)
+
+    def _flush(self, batch: List[PreparedDoc], out: queue.Queue, stop: threading.Event, st: StageStats) -> bool:
+        rows = [r for doc in batch for r in doc.rows]
+        t0 = time.perf_counter()
+        with span("index", "encode"):
+            vectors, cache_rows = self.embedding_cache.embed_deferred([r[4] for r in rows], [r[3] for r in rows])
+        st.busy_seconds += time.perf_counter() - t0
+        st.items += len(rows)
+        st.units += len(cache_rows)
+
+        cache_by_hash = {h: (h, dim, blob) for h, dim, blob in cache_rows}
+        offset = 0
+        for doc in batch:
+            n = len(doc.rows)
+            doc_vectors = vectors[offset:offset + n] if n else np.zeros((0, 0), dtype="float32")
+            offset += n
+            doc_cache_rows: List[Tuple[str, int, bytes]] = []
+            for r in doc.rows:
+                entry: Optional[Tuple[str, int, bytes]] = cache_by_hash.pop(r[3], None)
+                if entry is not None:
+                    doc_cache_rows.append(entry)
+            embedded = EmbeddedDoc(
+                job=doc.job,
+                rows=doc.rows,
+                vectors=doc_vectors,
+                cache_rows=doc_cache_rows,
+                pages=doc.pages,
+                changed_units=doc.changed_units,
+            )
+            if not _put(out, embedded, stop):
+                return False
+        return True
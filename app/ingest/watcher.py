@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from app.ingest.indexer import SOURCE_SUFFIXES
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:  # optional, Linux only; fall back to polling
+    INotify = None
+    flags = None
+
+
+# A handler receives a mode and the paths to re-index, or None to rescan the whole mode.
+Handler = Callable[[str, Optional[List[Path]]], None]
+Event = Tuple[str, Optional[Path]]
+
+
+def _relevant(path: Path, is_dir: bool) -> bool:
+    if path.name.startswith(".") or path.name.startswith("~$"):
+        return False
+    return is_dir or path.suffix.lower() in SOURCE_SUFFIXES
+
+
+class _InotifyBackend:
+    def __init__(self, roots: Dict[str, Path]):
+        self.inotify = INotify()
+        self.mask = (
+            flags.CREATE | flags.CLOSE_WRITE | flags.DELETE | flags.MOVED_FROM | flags.MOVED_TO | flags.DELETE_SELF
+        )
+        self.watches: Dict[int, Tuple[str, Path]] = {}
+        for mode, root in roots.items():
+            self._watch_tree(mode, root)
+
+    def _watch_tree(self, mode: str, root: Path) -> None:
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            try:
+                wd = self.inotify.add_watch(dirpath, self.mask)
+            except OSError:
+                continue
+            self.watches[wd] = (mode, Path(dirpath))
+
+    def poll(self, timeout_s: float) -> List[Event]:
+        out: List[Event] = []
+        for ev in self.inotify.read(timeout=int(timeout_s * 1000)):
+            if ev.mask & flags.Q_OVERFLOW:
+                out.extend((mode, None) for mode in {m for m, _ in self.watches.values()})
+                continue
+            watch = self.watches.get(ev.wd)
+            if watch is None:
+                continue
+            mode, parent = watch
+            if ev.mask & flags.IGNORED:
+                self.watches.pop(ev.wd, None)
+                continue
+            if not ev.name:
+                continue
+            path = parent / ev.name
+            is_dir = bool(ev.mask & flags.ISDIR)
+            if is_dir and ev.mask & (flags.CREATE | flags.MOVED_TO):
+                self._watch_tree(mode, path)
+            if _relevant(path, is_dir):
+                out.append((mode, path))
+        return out
+
+    def close(self) -> None:
+        self.inotify.close()
+
+
+class _PollingBackend:
+    def __init__(self, roots: Dict[str, Path], interval_s: float):
+        self.roots = roots
+        self.interval_s = interval_s
+        self.snapshots = {mode: self._scan(root) for mode, root in roots.items()}
+        self.next_scan = time.monotonic() + interval_s
+
+    @staticmethod
+    def _scan(root: Path) -> Dict[str, Tuple[int, int]]:
+        out: Dict[str, Tuple[int, int]] = {}
+        stack = [str(root)]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file() and _relevant(Path(entry.name), False):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        out[entry.path] = (st.st_mtime_ns, st.st_size)
+        return out
+
+    def poll(self, timeout_s: float) -> List[Event]:
+        # Trees are rescanned every interval_s at most; a shorter timeout (the
+        # watcher checking its debounce deadline) just returns without scanning.
+        wait = self.next_scan - time.monotonic()
+        if wait > 0:
+            time.sleep(min(timeout_s, wait))
+            if time.monotonic() < self.next_scan:
+                return []
+        self.next_scan = time.monotonic() + self.interval_s
+        out: List[Event] = []
+        for mode, root in self.roots.items():
+            before = self.snapshots[mode]
+            after = self._scan(root)
+            for path, sig in after.items():
+                if before.get(path) != sig:
+                    out.append((mode, Path(path)))
+            for path in before.keys() - after.keys():
+                out.append((mode, Path(path)))
+            self.snapshots[mode] = after
+        return out
+
+    def close(self) -> None:
+        pass
+
+
+class SourceWatcher:
+    def __init__(
+        self,
+        sources_dir: Path,
+        modes: List[str],
+        handler: Handler,
+        debounce_s: float = 1.0,
+        max_delay_s: float = 10.0,
+        poll_interval_s: float = 2.0,
+        use_inotify: bool = True,
+    ):
+        self.roots = {m: sources_dir / m for m in modes}
+        self.handler = handler
+        self.debounce_s = debounce_s
+        self.max_delay_s = max_delay_s
+        self.poll_interval_s = poll_interval_s
+        self.use_inotify = use_inotify and INotify is not None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.events = 0
+
+    @property
+    def backend_name(self) -> str:
+        return "inotify" if self.use_inotify else "polling"
+
+    def _backend(self):
+        for root in self.roots.values():
+            root.mkdir(parents=True, exist_ok=True)
+        if self.use_inotify:
+            return _InotifyBackend(self.roots)
+        return _PollingBackend(self.roots, self.poll_interval_s)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name="source-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def run(self) -> None:
+        backend = self._backend()
+        pending: Dict[str, Set[Path]] = {}
+        rescan: Set[str] = set()
+        first_at = last_at = 0.0
+        try:
+            while not self._stop.is_set():
+                events = backend.poll(self.debounce_s / 2 if pending or rescan else 1.0)
+                now = time.monotonic()
+                for mode, path in events:
+                    if not pending and not rescan:
+                        first_at = now
+                    last_at = now
+                    self.events += 1
+                    if path is None:
+                        rescan.add(mode)
+                    else:
+                        pending.setdefault(mode, set()).add(path)
+
+                if not pending and not rescan:
+                    continue
+                # Wait for a quiet period so bursts (editor saves, bulk copies) are
+                # coalesced, but never hold changes back longer than max_delay_s.
+                if now - last_at < self.debounce_s and now - first_at < self.max_delay_s:
+                    continue
+                batch, pending = pending, {}
+                full, rescan = rescan, set()
+                self._flush(batch, full)
+        finally:
+            backend.close()
+
+    def _flush(self, batch: Dict[str, Set[Path]], full: Set[str]) -> None:
+        self.batches += 1
+        for mode in sorted(set(batch) | full):
+            try:
+                self.handler(mode, None if mode in full else sorted(batch[mode]))
+            except Exception:
+                traceback.print_exc()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "backend": self.backend_name,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "events": self.events,
+            "batches": self.batches,
+        }
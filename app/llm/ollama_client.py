@@ -1,29 +1,128 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator
 import httpx
 
 
 @dataclass
 class OllamaConfig:
-    base_url: str = "http://127.0.0.1:11434"
+    base_url: str = os.environ.get("POS_OLLAMA_URL", "http://127.0.0.1:11434")
     model: str = "llama3.1:8b"
     temperature: float = 0.2
+    keep_alive: str = "30m"
+    timeout: float = 120.0
+    max_connections: int = 16
+    max_concurrency: int = 4
+    max_waiting: int = 16
+    acquire_timeout: float = 15.0
+
+
+class OllamaBusy(Exception):
+    pass
 
 
 class OllamaClient:
     def __init__(self, cfg: Optional[OllamaConfig] = None):
         self.cfg = cfg or OllamaConfig()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._in_flight = 0
+        self._rejected = 0
 
-    async def generate(self, prompt: str) -> str:
-        url = f"{self.cfg.base_url}/api/generate"
-        payload = {
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.cfg.base_url,
+                timeout=self.cfg.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.cfg.max_connections,
+                    max_keepalive_connections=self.cfg.max_connections,
+                ),
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def _slot(self):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.cfg.max_concurrency)
+        if self._sem.locked() and self._waiting >= self.cfg.max_waiting:
+            self._rejected += 1
+            raise OllamaBusy("LLM is busy: too many requests waiting")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), timeout=self.cfg.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            raise OllamaBusy("LLM is busy: timed out waiting for a generation slot")
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._sem.release()
+
+    def _payload(self, prompt: str, stream: bool) -> Dict[str, Any]:
+        return {
             "model": self.cfg.model,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
+            "keep_alive": self.cfg.keep_alive,
             "options": {"temperature": self.cfg.temperature},
         }
-        async with httpx.AsyncClient(timeout=120) as client:
-            r = await client.post(url, json=payload)
+
+    async def generate(self, prompt: str) -> str:
+        payload = self._payload(prompt, stream=False)
+        async with self._slot():
+            r = await self._http().post("/api/generate", json=payload)
             r.raise_for_status()
             data = r.json()
-            return data.get("response", "").strip()
\ No newline at end of file
+            return data.get("response", "").strip()
+
+    async def generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        payload = self._payload(prompt, stream=True)
+        async with self._slot():
+            async with self._http().stream("POST", "/api/generate", json=payload) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(data["error"])
+                    token = data.get("response", "")
+                    if token:
+                        yield token
+                    if data.get("done"):
+                        break
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "rejected": self._rejected,
+            "max_concurrency": self.cfg.max_concurrency,
+            "max_waiting": self.cfg.max_waiting,
+        }
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_client: Optional[OllamaClient] = None
+
+
+def get_ollama_client() -> OllamaClient:
+    global _client
+    if _client is None:
+        _client = OllamaClient()
+    return _client
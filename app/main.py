@@ -1,11 +1,23 @@
-from typing import Optional, List
+import json
+from typing import Optional, List, Union
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
 from app.config import settings
 from app.db import DB
+from app.embeddings import backend_variant, embedding_model_key
 from app.ingest.indexer import POSIndexer
-from app.retrieval.rag import query_pos
+from app.ingest.jobs import ReindexJobManager
+from app.ingest.watcher import SourceWatcher
+from app.llm.ollama_client import get_ollama_client
+from app.metrics import CONTENT_TYPE, cache_capacity, cache_entries, index_size_bytes, index_vectors, metrics
+from app.profiling import slow_queries
+from app.retrieval import index_files
+from app.retrieval.cache import answers, cache_stats, query_embeddings
+from app.retrieval.executor import batcher
+from app.retrieval.rag import query_pos, query_pos_batch, query_pos_stream
+from app.retrieval.registry import registry
 
 
 app = FastAPI(title="Personal Operating System RAG", version="1.0.0")
@@ -14,19 +26,64 @@ db = DB(settings.db_path)
 db.init()
 indexer = POSIndexer(db=db)
 indexer.ensure_dirs()
+jobs = ReindexJobManager(indexer, history=settings.reindex_job_history)
+registry.warmup(settings.modes)
+
+watcher = None
+if settings.watch_sources:
+    watcher = SourceWatcher(
+        settings.sources_dir,
+        list(settings.modes),
+        handler=lambda mode, paths: jobs.submit([mode], paths=paths),
+        debounce_s=settings.watch_debounce_s,
+        max_delay_s=settings.watch_max_delay_s,
+        poll_interval_s=settings.watch_poll_interval_s,
+        use_inotify=settings.watch_use_inotify,
+    )
+
+
+@app.on_event("startup")
+async def startup():
+    if watcher is not None:
+        watcher.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if watcher is not None:
+        watcher.stop()
+    await get_ollama_client().aclose()
 
 
 class QueryRequest(BaseModel):
-    mode: str
+    mode: Union[str, List[str]]
     question: str
     strict: bool = True
     retrieve_k: Optional[int] = None
     candidate_k: Optional[int] = None
     debug: bool = False
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    hybrid: Optional[bool] = None
+    profile: bool = False
+
+
+class BatchQueryRequest(BaseModel):
+    mode: Union[str, List[str]]
+    questions: List[str]
+    retrieve_k: Optional[int] = None
+    candidate_k: Optional[int] = None
+    debug: bool = False
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+    retrieval_only: bool = False
 
 
 class ReindexRequest(BaseModel):
     modes: Optional[List[str]] = None
+    compact: bool = False
+    gc_embeddings: bool = False
+    profile: bool = False
 
 
 @app.get("/status")
@@ -41,18 +98,57 @@ def status():
         "documents_per_mode": out,
         "sources_dir": str(settings.sources_dir),
         "db_path": str(settings.db_path),
+        "loaded_vectors_per_mode": registry.loaded_modes(),
+        "embedding": {"model": settings.embedding_model_name, "backend": backend_variant(), "cache_key": embedding_model_key()},
+        "llm": get_ollama_client().stats(),
+        "caches": cache_stats(),
+        "retrieval_batcher": batcher.stats(),
+        "watcher": watcher.stats() if watcher is not None else None,
+        "slow_queries": slow_queries.stats(),
     }
 
 
-@app.post("/reindex")
+@app.get("/metrics")
+def metrics_endpoint():
+    for mode in settings.modes:
+        d = index_files.current_dir(mode)
+        path = d / index_files.INDEX_FILE if d is not None else None
+        index_size_bytes.set(path.stat().st_size if path is not None and path.exists() else 0, mode=mode)
+    for mode, n in registry.loaded_modes().items():
+        index_vectors.set(n, mode=mode)
+    for name, cache in (("query_embeddings", query_embeddings), ("answers", answers)):
+        cache_entries.set(len(cache), cache=name)
+        cache_capacity.set(cache.maxsize, cache=name)
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+
+
+@app.post("/reindex", status_code=202)
 def reindex(req: ReindexRequest):
     modes = req.modes or list(settings.modes)
     modes = [m for m in modes if m in settings.modes]
-    stats = []
-    for m in modes:
-        st = indexer.index_mode(m)
-        stats.append(st.__dict__)
-    return {"ok": True, "stats": stats}
+    job = jobs.submit(modes, compact=req.compact, gc_embeddings=req.gc_embeddings, profile=req.profile)
+    return {"ok": True, "job_id": job.job_id, "job": job.as_dict()}
+
+
+@app.get("/reindex/jobs")
+def reindex_jobs():
+    return {"ok": True, "jobs": [j.as_dict() for j in jobs.recent()]}
+
+
+@app.get("/reindex/jobs/{job_id}")
+def reindex_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": f"Unknown job: {job_id}"})
+    return {"ok": True, "job": job.as_dict()}
+
+
+@app.post("/reindex/jobs/{job_id}/cancel")
+def cancel_reindex_job(job_id: str):
+    job = jobs.cancel(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"ok": False, "error": f"Unknown job: {job_id}"})
+    return {"ok": True, "job": job.as_dict()}
 
 
 @app.post("/query")
@@ -65,5 +161,50 @@ async def query(req: QueryRequest):
         retrieve_k=req.retrieve_k,
         candidate_k=req.candidate_k,
         debug=req.debug,
+        nprobe=req.nprobe,
+        ef_search=req.ef_search,
+        hybrid=req.hybrid,
+        profile=req.profile,
+    )
+    if result.get("busy"):
+        return JSONResponse(status_code=503, content=result, headers={"Retry-After": "1"})
+    return result
+
+
+@app.post("/query/batch")
+async def query_batch(req: BatchQueryRequest):
+    return await query_pos_batch(
+        db=db,
+        mode=req.mode,
+        questions=req.questions,
+        retrieve_k=req.retrieve_k,
+        candidate_k=req.candidate_k,
+        debug=req.debug,
+        nprobe=req.nprobe,
+        ef_search=req.ef_search,
+        retrieval_only=req.retrieval_only,
+    )
+
+
+@app.post("/query/stream")
+async def query_stream(req: QueryRequest):
+    async def events():
+        async for event, data in query_pos_stream(
+            db=db,
+            mode=req.mode,
+            question=req.question,
+            strict=req.strict,
+            retrieve_k=req.retrieve_k,
+            candidate_k=req.candidate_k,
+            debug=req.debug,
+            nprobe=req.nprobe,
+            ef_search=req.ef_search,
+            hybrid=req.hybrid,
+        ):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    return result
\ No newline at end of file
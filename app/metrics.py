@@ -0,0 +1,230 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Minimal Prometheus text-format metrics, so /metrics needs no extra dependency.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_label_str(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, +Inf overflow count, sum)
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            if i < len(self.buckets):
+                entry[0][i] += 1
+            else:
+                entry[1] += 1
+            entry[2] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        out: List[str] = []
+        for key, (counts, overflow, total) in items:
+            cumulative = 0
+            for le, n in zip(self.buckets, counts):
+                cumulative += n
+                out.append(f"{self.name}_bucket{_label_str(self.labelnames, key, ('le', _format_value(le)))} {cumulative}")
+            count = cumulative + overflow
+            out.append(f"{self.name}_bucket{_label_str(self.labelnames, key, ('le', '+Inf'))} {count}")
+            out.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {_format_value(total)}")
+            out.append(f"{self.name}_count{_label_str(self.labelnames, key)} {count}")
+        return out
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+metrics = MetricsRegistry()
+
+stage_seconds = metrics.histogram(
+    "pos_stage_seconds", "Time spent in each stage of the query and indexing paths.", ("path", "stage")
+)
+queries_total = metrics.counter("pos_queries_total", "Queries answered, by endpoint and outcome.", ("endpoint", "outcome"))
+llm_calls_total = metrics.counter("pos_llm_calls_total", "Generation requests sent to the LLM, by outcome.", ("outcome",))
+documents_indexed_total = metrics.counter("pos_documents_indexed_total", "Documents (re)indexed.", ("mode",))
+chunks_embedded_total = metrics.counter("pos_chunks_embedded_total", "Chunks written by indexing.", ("mode",))
+index_vectors = metrics.gauge("pos_index_vectors", "Vectors resident in the loaded FAISS index.", ("mode",))
+index_size_bytes = metrics.gauge("pos_index_size_bytes", "Size of the published FAISS index file.", ("mode",))
+cache_entries = metrics.gauge("pos_cache_entries", "Entries held by in-process caches.", ("cache",))
+cache_capacity = metrics.gauge("pos_cache_capacity", "Maximum entries of in-process caches.", ("cache",))
+
+
+# Per-request stage timings, accumulated by every span() run in its context.
+class Trace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict[str, float]:
+        out = {stage: round(s * 1000.0, 3) for stage, s in self.stages.items()}
+        out["total"] = round(self.elapsed() * 1000.0, 3)
+        return out
+
+
+_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("pos_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextmanager
+def trace(tr: Optional[Trace] = None) -> Iterator[Trace]:
+    tr = tr or Trace()
+    token = _trace.set(tr)
+    try:
+        yield tr
+    finally:
+        _trace.reset(token)
+
+
+def observe(path: str, stage: str, seconds: float) -> None:
+    stage_seconds.observe(seconds, path=path, stage=stage)
+    tr = _trace.get()
+    if tr is not None:
+        tr.add(stage, seconds)
+
+
+@contextmanager
+def span(path: str, stage: str) -> Iterator[None]:
+    # asyncio.to_thread copies the context, so spans in worker threads still
+    # land in the request's trace; threads of their own (the retrieval batcher)
+    # only feed the histograms and credit their callers' traces themselves.
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(path, stage, time.perf_counter() - t0)
@@ -0,0 +1,136 @@
+import json
+import os
+from pathlib import Path
+from typing import List, Union
+
+import numpy as np
+
+from app.config import settings
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+EXPORT_META_FILE = "export.json"
+
+
+def export_dir(model_name: str) -> Path:
+    return settings.onnx_dir / model_name.replace("/", "__")
+
+
+def export_model(model_name: str, out_dir: Path) -> None:
+    # One-off export with torch; encoding afterwards needs only onnxruntime and
+    # tokenizers. The graph covers the whole sentence-transformers pipeline
+    # (transformer, pooling, normalization), so outputs match encode().
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model_name, device="cpu")
+    st.eval()
+    names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in st.tokenizer.model_input_names]
+
+    class _SentenceEmbedding(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.st = st
+
+        def forward(self, *inputs):
+            return self.st(dict(zip(names, inputs)))["sentence_embedding"]
+
+    sample = st.tokenizer(["an example sentence to trace"], return_tensors="pt")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = out_dir / (MODEL_FILE + ".tmp")
+    with torch.no_grad():
+        torch.onnx.export(
+            _SentenceEmbedding(),
+            tuple(sample[n] for n in names),
+            str(tmp),
+            input_names=names,
+            output_names=["sentence_embedding"],
+            dynamic_axes={**{n: {0: "batch", 1: "sequence"} for n in names}, "sentence_embedding": {0: "batch"}},
+            opset_version=14,
+        )
+    st.tokenizer.save_pretrained(str(out_dir))
+    meta = {
+        "model": model_name,
+        "inputs": names,
+        "dim": int(st.get_sentence_embedding_dimension()),
+        "max_seq_length": int(st.max_seq_length),
+        "pad_token": st.tokenizer.pad_token,
+        "pad_id": int(st.tokenizer.pad_token_id),
+    }
+    (out_dir / EXPORT_META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(tmp, out_dir / MODEL_FILE)
+
+
+def quantize_model(out_dir: Path) -> None:
+    # Dynamic quantization: int8 weights, activations quantized on the fly, so
+    # no calibration data is needed.
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    tmp = out_dir / (QUANTIZED_FILE + ".tmp")
+    quantize_dynamic(str(out_dir / MODEL_FILE), str(tmp), weight_type=QuantType.QInt8)
+    os.replace(tmp, out_dir / QUANTIZED_FILE)
+
+
+class OnnxEncoder:
+    # Same encode() signature as SentenceTransformer, so it drops into the
+    # embedding cache, the vector stores and the retrieval batcher unchanged.
+    def __init__(self, model_name: str, quantize: bool = False, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        d = export_dir(model_name)
+        if not (d / MODEL_FILE).exists() or not (d / EXPORT_META_FILE).exists():
+            export_model(model_name, d)
+        path = d / MODEL_FILE
+        if quantize:
+            if not (d / QUANTIZED_FILE).exists():
+                quantize_model(d)
+            path = d / QUANTIZED_FILE
+
+        meta = json.loads((d / EXPORT_META_FILE).read_text(encoding="utf-8"))
+        self.model_name = model_name
+        self.quantized = quantize
+        self.input_names: List[str] = meta["inputs"]
+        self.dim = int(meta["dim"])
+        self.max_seq_length = int(meta["max_seq_length"])
+
+        self.tokenizer = Tokenizer.from_file(str(d / TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=meta["pad_id"], pad_token=meta["pad_token"])
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            opts.intra_op_num_threads = threads
+            opts.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(str(path), sess_options=opts, providers=["CPUExecutionProvider"])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        **kwargs,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        # Batches of similar length waste little compute on padding.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        for start in range(0, len(order), max(1, batch_size)):
+            idx = order[start:start + batch_size]
+            enc = self.tokenizer.encode_batch([texts[i] for i in idx])
+            feeds = {
+                "input_ids": np.asarray([e.ids for e in enc], dtype="int64"),
+                "attention_mask": np.asarray([e.attention_mask for e in enc], dtype="int64"),
+                "token_type_ids": np.asarray([e.type_ids for e in enc], dtype="int64"),
+            }
+            out[idx] = self.session.run(None, {n: feeds[n] for n in self.input_names})[0]
+        if normalize_embeddings:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
@@ -0,0 +1,128 @@
+import cProfile
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from app.config import settings
+
+
+class SlowQueryLog:
+    def __init__(self, path: Path, threshold_ms: float):
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def is_slow(self, elapsed_ms: float) -> bool:
+        return self.threshold_ms > 0 and elapsed_ms >= self.threshold_ms
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps({"ts": datetime.utcnow().isoformat(), **entry}, default=str)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"threshold_ms": self.threshold_ms, "path": str(self.path), "recorded": self.recorded}
+
+
+class _StackSampler:
+    # Samples every thread's stack at a fixed interval and counts collapsed
+    # stacks ("a;b;c N" lines), the input format of flamegraph tools. Unlike
+    # cProfile it sees the pipeline's worker threads, not just the caller's.
+    def __init__(self, interval_s: float):
+        self.interval_s = max(0.0005, interval_s)
+        self.counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval_s):
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.counts[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: Path) -> None:
+        with path.open("w", encoding="utf-8") as f:
+            for stack, n in self.counts.most_common():
+                f.write(f"{stack} {n}\n")
+
+
+@dataclass
+class ProfileResult:
+    path: Optional[Path] = None
+
+
+# cProfile allows one active profiler per process, and overlapping profiles of
+# concurrent requests would mix their samples anyway; extra requests run unprofiled.
+_active = threading.Lock()
+
+
+def should_profile(requested: bool = False) -> bool:
+    return requested or (settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate)
+
+
+@contextmanager
+def profiled(name: str, enabled: bool) -> Iterator[ProfileResult]:
+    result = ProfileResult()
+    if not enabled or not _active.acquire(blocking=False):
+        yield result
+        return
+    try:
+        stamp = time.strftime("%Y%m%dT%H%M%S")
+        if settings.profiler == "sample":
+            prof = _StackSampler(settings.profile_sample_interval_ms / 1000.0)
+            prof.start()
+            suffix = ".folded"
+        else:
+            prof = cProfile.Profile()
+            prof.enable()
+            suffix = ".prof"
+        try:
+            yield result
+        finally:
+            if isinstance(prof, cProfile.Profile):
+                prof.disable()
+            else:
+                prof.stop()
+            settings.profile_dir.mkdir(parents=True, exist_ok=True)
+            path = settings.profile_dir / f"{name}-{stamp}-{uuid.uuid4().hex[:8]}{suffix}"
+            if isinstance(prof, cProfile.Profile):
+                prof.dump_stats(str(path))
+            else:
+                prof.dump(path)
+            result.path = path
+    finally:
+        _active.release()
+
+
+slow_queries = SlowQueryLog(settings.slow_query_log, settings.slow_query_ms)
@@ -0,0 +1,108 @@
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+import faiss
+
+from app.config import IndexConfig
+
+
+KINDS = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+
+
+def effective_kind(cfg: IndexConfig, n: int) -> str:
+    if cfg.kind not in KINDS:
+        raise ValueError(f"Unknown index kind: {cfg.kind}")
+    if cfg.kind == "flat" or n < cfg.min_vectors:
+        return "flat"
+    return cfg.kind
+
+
+def _nlist(cfg: IndexConfig, n: int) -> int:
+    if cfg.nlist > 0:
+        return cfg.nlist
+    return max(1, min(int(4 * math.sqrt(n)), n // 39))
+
+
+def factory_string(kind: str, cfg: IndexConfig, n: int) -> str:
+    if kind == "flat":
+        return "Flat"
+    if kind == "hnsw":
+        return f"HNSW{cfg.hnsw_m},Flat"
+    if kind == "ivf_flat":
+        return f"IVF{_nlist(cfg, n)},Flat"
+    if kind == "ivf_pq":
+        return f"IVF{_nlist(cfg, n)},PQ{cfg.pq_m}x{cfg.pq_nbits}"
+    raise ValueError(f"Unknown index kind: {kind}")
+
+
+def build_index(cfg: IndexConfig, vectors: np.ndarray, ids: np.ndarray) -> Tuple[faiss.Index, str, str]:
+    n, dim = vectors.shape
+    kind = effective_kind(cfg, n)
+    spec = factory_string(kind, cfg, n)
+    sub = faiss.index_factory(dim, spec, faiss.METRIC_INNER_PRODUCT)
+
+    if kind == "hnsw":
+        faiss.downcast_index(sub).hnsw.efConstruction = cfg.ef_construction
+    if not sub.is_trained:
+        sub.train(vectors)
+
+    index = faiss.IndexIDMap2(sub)
+    index.add_with_ids(vectors, ids)
+    return index, kind, spec
+
+
+def index_kind(index: faiss.Index) -> str:
+    sub = faiss.downcast_index(index.index) if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)) else index
+    if isinstance(sub, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(sub, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(sub, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def supports_remove(kind: str) -> bool:
+    return kind != "hnsw"
+
+
+def search_params(kind: str, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    if kind in ("ivf_flat", "ivf_pq") and nprobe:
+        return faiss.SearchParametersIVF(nprobe=int(nprobe))
+    if kind == "hnsw" and ef_search:
+        return faiss.SearchParametersHNSW(efSearch=int(ef_search))
+    return None
+
+
+def recall_at_k(
+    index: faiss.Index,
+    vectors: np.ndarray,
+    ids: np.ndarray,
+    k: int,
+    n_queries: int,
+    params=None,
+    seed: int = 0,
+) -> float:
+    n = vectors.shape[0]
+    if n == 0:
+        return 1.0
+    k = min(k, n)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(n, size=min(n_queries, n), replace=False)
+    queries = vectors[sample]
+
+    exact = faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+    truth_ids = ids[truth]
+
+    if params is not None:
+        _, approx_ids = index.search(queries, k, params=params)
+    else:
+        _, approx_ids = index.search(queries, k)
+
+    hits = 0
+    for t, a in zip(truth_ids, approx_ids):
+        hits += len(set(t.tolist()) & set(a.tolist()))
+    return hits / float(k * len(queries))
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from app.config import settings
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.split()).lower()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+class InFlight:
+    def __init__(self):
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._pending.get(key)
+        if fut is not None:
+            self.coalesced += 1
+        while fut is not None:
+            try:
+                return await asyncio.shield(fut)
+            except _LeaderCancelled:
+                # The request doing the work went away; the first follower to
+                # notice takes over and the rest wait on it instead.
+                fut = self._pending.get(key)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[key] = fut
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            # Cancelling the shared future would cancel every follower as well.
+            fut.set_exception(_LeaderCancelled())
+            fut.exception()
+            raise
+        except BaseException as exc:
+            fut.set_exception(exc)
+            fut.exception()
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._pending.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._pending), "coalesced": self.coalesced}
+
+
+query_embeddings = LRUCache(settings.query_embedding_cache_size)
+answers = LRUCache(settings.answer_cache_size)
+embedding_inflight = InFlight()
+answer_inflight = InFlight()
+
+
+def cache_stats() -> Dict[str, Any]:
+    return {
+        "query_embeddings": {**query_embeddings.stats(), **embedding_inflight.stats()},
+        "answers": {**answers.stats(), **answer_inflight.stats()},
+    }
@@ -0,0 +1,163 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.metrics import Trace, current_trace
+from app.retrieval.cache import normalize_question
+from app.retrieval.fanout import encode_cached, merge_shards
+from app.retrieval.registry import registry
+from app.retrieval.vector_store import Retrieved
+
+
+@dataclass
+class _Request:
+    text: str
+    modes: Tuple[str, ...]
+    top_k: int
+    nprobe: Optional[int]
+    ef_search: Optional[int]
+    norm: str
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future
+    trace: Optional[Trace] = None
+
+    def group_key(self) -> Tuple:
+        return (self.modes, self.top_k, self.nprobe, self.ef_search, self.norm)
+
+
+def _resolve(fut: asyncio.Future, result: Any = None, exc: Optional[BaseException] = None) -> None:
+    if fut.done():
+        return
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
+
+
+def _deliver(req: _Request, result: Any = None, exc: Optional[BaseException] = None) -> None:
+    try:
+        req.loop.call_soon_threadsafe(_resolve, req.future, result, exc)
+    except RuntimeError:
+        pass  # the requesting event loop has already shut down
+
+
+def _credit(reqs: List[_Request], stage: str, seconds: float) -> None:
+    # Spans on the batcher thread have no request context, so each caller's trace
+    # is credited with the shared batch time here instead.
+    for req in reqs:
+        if req.trace is not None:
+            req.trace.add(stage, seconds)
+
+
+class RetrievalBatcher:
+    def __init__(self, window_ms: float, max_batch: int):
+        self.window_s = max(0.0, window_ms) / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._shards = ThreadPoolExecutor(max_workers=max(1, len(settings.modes)), thread_name_prefix="shard")
+        self.batches = 0
+        self.items = 0
+        self.max_seen = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="retrieval-batcher", daemon=True)
+                self._thread.start()
+
+    async def search(
+        self,
+        modes: List[str],
+        question: str,
+        top_k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        norm: str = "none",
+    ) -> List[Retrieved]:
+        self._ensure_started()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._queue.put(
+            _Request(
+                text=normalize_question(question),
+                modes=tuple(modes),
+                top_k=top_k,
+                nprobe=nprobe,
+                ef_search=ef_search,
+                norm=norm,
+                loop=loop,
+                future=fut,
+                trace=current_trace(),
+            )
+        )
+        return await fut
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window_s
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._process(batch)
+            except BaseException as exc:
+                for req in batch:
+                    _deliver(req, exc=exc)
+
+    def _process(self, batch: List[_Request]) -> None:
+        self.batches += 1
+        self.items += len(batch)
+        self.max_seen = max(self.max_seen, len(batch))
+
+        t0 = time.perf_counter()
+        texts = list(dict.fromkeys(r.text for r in batch))
+        vectors = dict(zip(texts, encode_cached(texts)))
+        _credit(batch, "encode", time.perf_counter() - t0)
+
+        groups: Dict[Tuple, List[_Request]] = {}
+        for req in batch:
+            groups.setdefault(req.group_key(), []).append(req)
+
+        for (modes, top_k, nprobe, ef_search, norm), reqs in groups.items():
+            queries = np.vstack([vectors[r.text] for r in reqs])
+            stores = [registry.get(m) for m in modes]
+            t0 = time.perf_counter()
+            if len(stores) == 1:
+                shard_results = [stores[0].search_vectors(queries, top_k, nprobe, ef_search)]
+            else:
+                shard_results = list(
+                    self._shards.map(lambda s: s.search_vectors(queries, top_k, nprobe, ef_search), stores)
+                )
+            _credit(reqs, "faiss_search", time.perf_counter() - t0)
+            for i, req in enumerate(reqs):
+                merged = merge_shards([res[i] for res in shard_results], top_k, norm) if stores else []
+                _deliver(req, merged)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window_s * 1000.0,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "queries": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_seen": self.max_seen,
+            "queued": self._queue.qsize(),
+        }
+
+
+batcher = RetrievalBatcher(settings.retrieval_batch_window_ms, settings.retrieval_max_batch)
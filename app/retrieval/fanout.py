@@ -0,0 +1,105 @@
+import asyncio
+import math
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from app.embeddings import embedding_model_key
+from app.retrieval.cache import embedding_inflight, normalize_question, query_embeddings
+from app.retrieval.registry import registry
+from app.retrieval.vector_store import Retrieved
+
+
+def normalize_shard_scores(results: List[Retrieved], method: str) -> List[float]:
+    scores = [r.score for r in results]
+    if not scores or method == "none":
+        return scores
+    if method == "minmax":
+        lo, hi = min(scores), max(scores)
+        if hi - lo <= 1e-12:
+            return [1.0 for _ in scores]
+        return [(s - lo) / (hi - lo) for s in scores]
+    if method == "zscore":
+        mean = sum(scores) / len(scores)
+        std = math.sqrt(sum((s - mean) ** 2 for s in scores) / len(scores))
+        if std <= 1e-12:
+            return [0.0 for _ in scores]
+        return [(s - mean) / std for s in scores]
+    raise ValueError(f"Unknown shard score normalization: {method}")
+
+
+async def encode_question(question: str) -> np.ndarray:
+    text = normalize_question(question)
+    key = (embedding_model_key(), text)
+    cached = query_embeddings.get(key)
+    if cached is not None:
+        return cached
+    vec = await embedding_inflight.run(key, lambda: asyncio.to_thread(registry.encode, [text]))
+    query_embeddings.put(key, vec)
+    return vec
+
+
+def encode_cached(texts: List[str]) -> np.ndarray:
+    # Texts must already be normalized. Shared by the async paths and the retrieval
+    # batcher thread: cached vectors are reused and each distinct miss is encoded once.
+    keys = [(embedding_model_key(), t) for t in texts]
+    vectors: List[Optional[np.ndarray]] = [query_embeddings.get(k) for k in keys]
+
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    if missing:
+        encoded = registry.encode(missing)
+        by_text = {}
+        for t, row in zip(missing, encoded):
+            vec = row.reshape(1, -1)
+            by_text[t] = vec
+            query_embeddings.put((embedding_model_key(), t), vec)
+        vectors = [v if v is not None else by_text[t] for t, v in zip(texts, vectors)]
+    return np.vstack(vectors)
+
+
+async def encode_questions(questions: List[str]) -> np.ndarray:
+    return await asyncio.to_thread(encode_cached, [normalize_question(q) for q in questions])
+
+
+def merge_shards(shard_hits: List[List[Retrieved]], top_k: int, norm: str) -> List[Retrieved]:
+    if len(shard_hits) == 1:
+        return shard_hits[0][:top_k]
+    merged = []
+    for hits in shard_hits:
+        merged.extend(zip(normalize_shard_scores(hits, norm), hits))
+    merged.sort(key=lambda x: x[0], reverse=True)
+    return [r for _, r in merged[:top_k]]
+
+
+async def fanout_search_vectors(
+    modes: Sequence[str],
+    queries: np.ndarray,
+    top_k: int,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    norm: str = "none",
+) -> List[List[Retrieved]]:
+    stores = [registry.get(m) for m in modes]
+    if not stores:
+        return [[] for _ in range(len(queries))]
+
+    shard_results = await asyncio.gather(
+        *[asyncio.to_thread(s.search_vectors, queries, top_k, nprobe, ef_search) for s in stores]
+    )
+    return [
+        merge_shards([res[i] for res in shard_results], top_k, norm)
+        for i in range(len(queries))
+    ]
+
+
+async def fanout_search(
+    modes: Sequence[str],
+    question: str,
+    top_k: int,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    norm: str = "none",
+) -> List[Retrieved]:
+    qvec = await encode_question(question)
+    results = await fanout_search_vectors(modes, qvec, top_k, nprobe=nprobe, ef_search=ef_search, norm=norm)
+    return results[0]
@@ -0,0 +1,15 @@
+from typing import Dict, List, Sequence
+
+from app.retrieval.vector_store import Retrieved
+
+
+def reciprocal_rank_fusion(ranked_lists: Sequence[List[Retrieved]], k: int = 60) -> List[Retrieved]:
+    fused: Dict[int, float] = {}
+    modes: Dict[int, str] = {}
+    for ranked in ranked_lists:
+        for rank, r in enumerate(ranked, start=1):
+            fused[r.chunk_key] = fused.get(r.chunk_key, 0.0) + 1.0 / (k + rank)
+            if r.mode is not None:
+                modes.setdefault(r.chunk_key, r.mode)
+    order = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+    return [Retrieved(chunk_key=key, score=score, mode=modes.get(key)) for key, score in order]
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import settings
+from app.ingest.hashing import stable_chunk_key
+
+
+INDEX_FILE = "index.faiss"
+IDS_FILE = "chunk_ids.json"  # legacy: pretty-printed list of hex chunk ids
+DIGESTS_FILE = "chunk_digests.npy"  # (n, 32) uint8 chunk id digests; FAISS ids derive from them
+META_FILE = "index_meta.json"
+CURRENT_FILE = "CURRENT"
+BUNDLE_FORMAT = 2
+
+_version_re = re.compile(r"^v(\d+)$")
+
+
+def chunk_vector_id(chunk_id: str) -> int:
+    return stable_chunk_key(chunk_id)
+
+
+def mode_dir(mode: str) -> Path:
+    return settings.index_dir / "faiss" / mode
+
+
+def current_pointer(mode: str) -> Path:
+    return mode_dir(mode) / CURRENT_FILE
+
+
+def read_current(mode: str) -> Optional[str]:
+    try:
+        name = current_pointer(mode).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return name or None
+
+
+def current_dir(mode: str) -> Optional[Path]:
+    name = read_current(mode)
+    if name is not None:
+        d = mode_dir(mode) / name
+        return d if (d / INDEX_FILE).exists() else None
+    legacy = mode_dir(mode)
+    if (legacy / INDEX_FILE).exists() and (legacy / IDS_FILE).exists():
+        return legacy
+    return None
+
+
+def is_bundle(d: Path) -> bool:
+    return (d / DIGESTS_FILE).exists() and (d / META_FILE).exists()
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def write_bundle(d: Path, chunk_ids: Sequence[str], meta: Dict) -> None:
+    digests = np.frombuffer(b"".join(bytes.fromhex(cid) for cid in chunk_ids), dtype=np.uint8)
+    np.save(d / DIGESTS_FILE, digests.reshape(len(chunk_ids), 32))
+
+    meta["format"] = BUNDLE_FORMAT
+    meta["files"] = {
+        name: {"size": (d / name).stat().st_size, "sha256": _sha256(d / name)}
+        for name in (INDEX_FILE, DIGESTS_FILE)
+    }
+    # The manifest goes last: a bundle without one is never published.
+    (d / META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+
+def read_manifest(d: Path) -> Optional[Dict]:
+    try:
+        return json.loads((d / META_FILE).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def verify_bundle(d: Path, manifest: Dict, checksums: bool = False) -> None:
+    for name, expected in (manifest.get("files") or {}).items():
+        path = d / name
+        if path.stat().st_size != expected["size"]:
+            raise ValueError(f"{path} has size {path.stat().st_size}, manifest says {expected['size']}")
+        if checksums and _sha256(path) != expected["sha256"]:
+            raise ValueError(f"{path} does not match its manifest checksum")
+
+
+def read_chunk_ids(d: Path) -> List[str]:
+    if is_bundle(d):
+        return [row.tobytes().hex() for row in np.load(d / DIGESTS_FILE)]
+    return json.loads((d / IDS_FILE).read_text(encoding="utf-8"))
+
+
+def list_versions(mode: str) -> List[int]:
+    root = mode_dir(mode)
+    if not root.exists():
+        return []
+    out = []
+    for p in root.iterdir():
+        m = _version_re.match(p.name)
+        if m and p.is_dir():
+            out.append(int(m.group(1)))
+    return sorted(out)
+
+
+def new_version_dir(mode: str) -> Path:
+    versions = list_versions(mode)
+    d = mode_dir(mode) / f"v{(versions[-1] + 1) if versions else 1}"
+    d.mkdir(parents=True, exist_ok=False)
+    return d
+
+
+def publish(mode: str, version_dir: Path) -> None:
+    pointer = current_pointer(mode)
+    tmp = pointer.with_name(CURRENT_FILE + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        f.write(version_dir.name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pointer)
+    _remove_legacy(mode)
+
+
+def unpublish(mode: str) -> None:
+    pointer = current_pointer(mode)
+    if pointer.exists():
+        pointer.unlink()
+    _remove_legacy(mode)
+
+
+def prune(mode: str, keep: int) -> None:
+    current = read_current(mode)
+    versions = list_versions(mode)
+    for v in versions[:-keep] if keep > 0 else versions:
+        name = f"v{v}"
+        if name != current:
+            shutil.rmtree(mode_dir(mode) / name, ignore_errors=True)
+
+
+def _remove_legacy(mode: str) -> None:
+    root = mode_dir(mode)
+    for name in (INDEX_FILE, IDS_FILE, META_FILE):
+        p = root / name
+        if p.exists():
+            p.unlink()
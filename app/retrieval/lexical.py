@@ -0,0 +1,35 @@
+import re
+from typing import List
+
+from app.config import settings
+from app.db import DB
+from app.retrieval.vector_store import Retrieved
+
+
+_token_re = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(question: str, max_terms: int = 32) -> str:
+    terms = []
+    seen = set()
+    for tok in _token_re.findall(question):
+        t = tok.lower()
+        if len(t) < 2 or t in seen:
+            continue
+        seen.add(t)
+        terms.append(f'"{t}"')
+        if len(terms) >= max_terms:
+            break
+    return " OR ".join(terms)
+
+
+def search_lexical(db: DB, modes: List[str], question: str, top_k: int) -> List[Retrieved]:
+    hits = db.search_chunks_fts(modes, fts_query(question), top_k)
+    return [Retrieved(chunk_key=key, score=score, mode=mode) for key, mode, score in hits]
+
+
+def lexical_confidence(bm25: float) -> float:
+    # FTS5 floors the IDF of terms found in most chunks, so common words score
+    # about 0 while a rare term or identifier scores several points; squash that
+    # onto [0, 1) so it sits next to cosine scores in citations and gating.
+    return bm25 / (bm25 + settings.lexical_score_scale) if bm25 > 0 else 0.0
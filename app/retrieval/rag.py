@@ -1,9 +1,25 @@
+import asyncio
+import time
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
 
 from app.config import settings
 from app.db import DB
-from app.retrieval.vector_store import ModeVectorStore
+from app.ingest.hashing import sha256_text
+from app.llm.ollama_client import OllamaBusy, get_ollama_client
+from app.metrics import Trace, llm_calls_total, observe, queries_total, span, trace
+from app.profiling import profiled, should_profile, slow_queries
+from app.retrieval.cache import answer_inflight, answers, normalize_question
+from app.retrieval.executor import batcher
+from app.retrieval.fanout import encode_questions, fanout_search, fanout_search_vectors
+from app.retrieval.hybrid import reciprocal_rank_fusion
+from app.retrieval.lexical import lexical_confidence, search_lexical
+from app.retrieval.registry import registry
+from app.retrieval.vector_store import Retrieved
+
+
+NO_INFO_ANSWER = "I don’t have enough information in your sources to answer that."
+LOW_CONFIDENCE_ANSWER = "I don’t have enough high-confidence evidence in your sources to answer that. Try rephrasing, selecting a different mode, or reindexing your documents."
 
 
 @dataclass
@@ -14,6 +30,16 @@ class Citation:
     page: Optional[int]
     score: float
     snippet: str
+    mode: Optional[str] = None
+
+
+def resolve_modes(mode: Union[str, Sequence[str]]) -> Optional[List[str]]:
+    requested = [mode] if isinstance(mode, str) else list(mode)
+    if "all" in requested:
+        return list(settings.modes)
+    if not requested or any(m not in settings.modes for m in requested):
+        return None
+    return list(dict.fromkeys(requested))
 
 
 def _make_snippet(text: str, limit: int = 350) -> str:
@@ -25,7 +51,7 @@ def _make_snippet(text: str, limit: int = 350) -> str:
 
 def _compose_grounded_answer(question: str, citations: List[Citation]) -> str:
     if not citations:
-        return "I don’t have enough information in your sources to answer that."
+        return NO_INFO_ANSWER
 
     parts = []
     parts.append(f"Question: {question}")
@@ -50,86 +76,515 @@ def _compose_grounded_answer(question: str, citations: List[Citation]) -> str:
     return "\n".join(parts)
 
 
-async def query_pos(
+async def _timed(stage: str, aw):
+    with span("query", stage):
+        return await aw
+
+
+@dataclass
+class PreparedQuery:
+    mode: Union[str, List[str]]
+    modes: List[str]
+    question: str
+    refused: bool
+    citations: List[Citation]
+    answer: Optional[str] = None
+    debug: Optional[Dict[str, Any]] = None
+    index_versions: Tuple = ()
+
+    def answer_key(self) -> Tuple:
+        return (
+            tuple(self.modes),
+            normalize_question(self.question),
+            self.index_versions,
+            tuple(c.chunk_id for c in self.citations),
+        )
+
+
+async def prepare_query(
     db: DB,
-    mode: str,
+    mode: Union[str, List[str]],
     question: str,
-    strict: bool = True,
     retrieve_k: Optional[int] = None,
     candidate_k: Optional[int] = None,
     debug: bool = False,
-) -> Dict[str, Any]:
-    if mode not in settings.modes:
-        return {"ok": False, "error": f"Unknown mode: {mode}"}
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    hybrid: Optional[bool] = None,
+) -> Optional[PreparedQuery]:
+    modes = resolve_modes(mode)
+    if modes is None:
+        return None
 
     rk = retrieve_k or settings.retrieve_k
     ck = candidate_k or settings.candidate_k
 
-    store = ModeVectorStore(mode=mode)
-    retrieved = store.search(question, top_k=ck)
-
-    if not retrieved:
-        return {
-            "ok": True,
-            "mode": mode,
-            "refused": True,
-            "answer": "I don’t have enough information in your sources to answer that.",
-            "citations": [],
-            "debug": {"reason": "no_index_or_no_results"} if debug else None,
-        }
+    use_hybrid = settings.hybrid_search if hybrid is None else hybrid
+
+    if settings.retrieval_batch_window_ms > 0:
+        dense = batcher.search(modes, question, ck, nprobe=nprobe, ef_search=ef_search, norm=settings.shard_score_norm)
+    else:
+        dense = fanout_search(modes, question, ck, nprobe=nprobe, ef_search=ef_search, norm=settings.shard_score_norm)
+    dense = _timed("dense_search", dense)
+    if use_hybrid:
+        retrieved, lexical = await asyncio.gather(
+            dense,
+            _timed("lexical_search", asyncio.to_thread(search_lexical, db, modes, question, settings.lexical_k)),
+        )
+    else:
+        retrieved = await dense
+        lexical = []
+
+    top, fused = _select_top(retrieved, lexical, rk)
+    with span("query", "fetch_chunks"):
+        chunk_rows = await asyncio.to_thread(db.list_chunks_by_keys, [r.chunk_key for r in top])
+    by_key = {c["chunk_key"]: c for c in chunk_rows}
+
+    return _finalize(
+        mode=mode,
+        modes=modes,
+        question=question,
+        retrieved=retrieved,
+        lexical=lexical,
+        fused=fused,
+        top=top,
+        by_key=by_key,
+        rk=rk,
+        debug=debug,
+        use_hybrid=use_hybrid,
+    )
+
+
+def _select_top(retrieved: List[Retrieved], lexical: List[Retrieved], rk: int) -> Tuple[List[Retrieved], List[Retrieved]]:
+    if not lexical:
+        return retrieved[:rk], []
+    dense_scores = {r.chunk_key: r.score for r in retrieved}
+    lexical_scores = {r.chunk_key: lexical_confidence(r.score) for r in lexical}
+    fused = reciprocal_rank_fusion([retrieved, lexical], k=settings.rrf_k)
+    top = [
+        Retrieved(chunk_key=f.chunk_key, score=dense_scores.get(f.chunk_key, lexical_scores.get(f.chunk_key, 0.0)), mode=f.mode)
+        for f in fused[:rk]
+    ]
+    return top, fused
+
+
+def _finalize(
+    mode: Union[str, List[str]],
+    modes: List[str],
+    question: str,
+    retrieved: List[Retrieved],
+    lexical: List[Retrieved],
+    fused: List[Retrieved],
+    top: List[Retrieved],
+    by_key: Dict[int, Dict[str, Any]],
+    rk: int,
+    debug: bool,
+    use_hybrid: bool,
+) -> PreparedQuery:
+    if not retrieved and not lexical:
+        return PreparedQuery(
+            mode=mode,
+            modes=modes,
+            question=question,
+            refused=True,
+            citations=[],
+            answer=NO_INFO_ANSWER,
+            debug={"reason": "no_index_or_no_results"} if debug else None,
+        )
 
-    top = retrieved[:rk]
-    top_scores = [r.score for r in top]
+    top_scores = [r.score for r in retrieved[:rk]]
     top_score = max(top_scores) if top_scores else 0.0
     mean_score = sum(top_scores) / len(top_scores) if top_scores else 0.0
 
-    should_refuse = (top_score < settings.min_top_score) or (mean_score < settings.min_mean_score)
+    # Keyword hits that made it into the citations count as evidence on their own,
+    # so exact identifiers and rare terms are answered even when dense scores are low.
+    cited = {r.chunk_key for r in top}
+    lexical_score = max((lexical_confidence(r.score) for r in lexical if r.chunk_key in cited), default=0.0)
 
-    chunk_ids = [r.chunk_id for r in top]
-    chunk_rows = db.list_chunks_by_ids(chunk_ids)
-    by_id = {c["chunk_id"]: c for c in chunk_rows}
+    dense_weak = (top_score < settings.min_top_score) or (mean_score < settings.min_mean_score)
+    should_refuse = dense_weak and lexical_score < settings.min_lexical_score
 
     citations: List[Citation] = []
     for r in top:
-        row = by_id.get(r.chunk_id)
+        row = by_key.get(r.chunk_key)
         if not row:
             continue
         citations.append(
             Citation(
-                chunk_id=r.chunk_id,
+                chunk_id=row["chunk_id"],
                 source_path=row["source_path"],
                 heading=row.get("heading"),
                 page=row.get("page"),
                 score=r.score,
                 snippet=_make_snippet(row["text"]),
+                mode=row.get("mode"),
             )
         )
 
-    if should_refuse:
-        answer = "I don’t have enough high-confidence evidence in your sources to answer that. Try rephrasing, selecting a different mode, or reindexing your documents."
-    else:
-        print("LLM CALLED ✅")
-        from app.llm.ollama_client import OllamaClient
-        prompt = build_llm_prompt(question, citations)
-        client = OllamaClient()
-        answer = await client.generate(prompt)
     dbg = None
     if debug:
         dbg = {
             "top_score": top_score,
             "mean_score": mean_score,
-            "thresholds": {"min_top_score": settings.min_top_score, "min_mean_score": settings.min_mean_score},
-            "retrieved": [{"chunk_id": r.chunk_id, "score": r.score} for r in retrieved[:min(len(retrieved), 20)]],
+            "lexical_score": lexical_score,
+            "thresholds": {
+                "min_top_score": settings.min_top_score,
+                "min_mean_score": settings.min_mean_score,
+                "min_lexical_score": settings.min_lexical_score,
+            },
+            "modes": modes,
+            "retrieved": [{"chunk_key": r.chunk_key, "mode": r.mode, "score": r.score} for r in retrieved[:min(len(retrieved), 20)]],
+            "hybrid": use_hybrid,
+            "lexical": [{"chunk_key": r.chunk_key, "bm25": r.score} for r in lexical[:20]],
+            "fused": [{"chunk_key": r.chunk_key, "rrf": r.score} for r in fused[:20]],
         }
 
+    return PreparedQuery(
+        mode=mode,
+        modes=modes,
+        question=question,
+        refused=should_refuse,
+        citations=citations,
+        answer=LOW_CONFIDENCE_ANSWER if should_refuse else None,
+        debug=dbg,
+        index_versions=tuple(registry.version(m) for m in modes),
+    )
+
+
+def _response(prepared: PreparedQuery, answer: str) -> Dict[str, Any]:
     return {
         "ok": True,
-        "mode": mode,
-        "refused": should_refuse,
+        "mode": prepared.mode,
+        "refused": prepared.refused,
         "answer": answer,
-        "citations": [c.__dict__ for c in citations],
-        "debug": dbg,
+        "citations": [c.__dict__ for c in prepared.citations],
+        "debug": prepared.debug,
+    }
+
+
+async def query_pos(
+    db: DB,
+    mode: Union[str, List[str]],
+    question: str,
+    strict: bool = True,
+    retrieve_k: Optional[int] = None,
+    candidate_k: Optional[int] = None,
+    debug: bool = False,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    hybrid: Optional[bool] = None,
+    profile: bool = False,
+) -> Dict[str, Any]:
+    with trace() as tr, profiled("query", should_profile(profile)) as prof:
+        result = await _query_pos(db, mode, question, retrieve_k, candidate_k, debug, nprobe, ef_search, hybrid)
+    elapsed = tr.elapsed()
+    timings = tr.as_dict()
+    observe("query", "total", elapsed)
+    queries_total.inc(endpoint="query", outcome=_outcome(result))
+    if prof.path is not None:
+        result["profile"] = str(prof.path)
+    if result.get("debug") is not None:
+        result["debug"]["timings_ms"] = timings
+    await _log_if_slow(
+        "query",
+        mode,
+        tr,
+        retrieve_k,
+        candidate_k,
+        hybrid,
+        **_question_fields(question, result),
+        profile=result.get("profile"),
+    )
+    return result
+
+
+def _question_fields(question: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "question_sha256": sha256_text(normalize_question(question)),
+        "scores": [c["score"] for c in result.get("citations", [])],
+        "outcome": _outcome(result),
     }
+
+
+async def _log_if_slow(
+    endpoint: str,
+    mode: Union[str, List[str]],
+    tr: Trace,
+    retrieve_k: Optional[int],
+    candidate_k: Optional[int],
+    hybrid: Optional[bool],
+    **fields: Any,
+) -> None:
+    elapsed = tr.elapsed()
+    if not slow_queries.is_slow(elapsed * 1000.0):
+        return
+    modes = resolve_modes(mode) or []
+    entry = {
+        "endpoint": endpoint,
+        "mode": mode,
+        "retrieve_k": retrieve_k or settings.retrieve_k,
+        "candidate_k": candidate_k or settings.candidate_k,
+        "hybrid": settings.hybrid_search if hybrid is None else hybrid,
+        "elapsed_ms": round(elapsed * 1000.0, 3),
+        "timings_ms": tr.as_dict(),
+        "index_versions": {m: registry.version(m) for m in modes},
+        **fields,
+    }
+    await asyncio.to_thread(slow_queries.record, entry)
+
+
+def _outcome(result: Dict[str, Any]) -> str:
+    if result.get("busy"):
+        return "busy"
+    if not result.get("ok"):
+        return "error"
+    return "refused" if result.get("refused") else "answered"
+
+
+async def _query_pos(
+    db: DB,
+    mode: Union[str, List[str]],
+    question: str,
+    retrieve_k: Optional[int],
+    candidate_k: Optional[int],
+    debug: bool,
+    nprobe: Optional[int],
+    ef_search: Optional[int],
+    hybrid: Optional[bool],
+) -> Dict[str, Any]:
+    prepared = await prepare_query(
+        db,
+        mode,
+        question,
+        retrieve_k=retrieve_k,
+        candidate_k=candidate_k,
+        debug=debug,
+        nprobe=nprobe,
+        ef_search=ef_search,
+        hybrid=hybrid,
+    )
+    if prepared is None:
+        return {"ok": False, "error": f"Unknown mode: {mode}"}
+
+    if prepared.answer is not None:
+        return _response(prepared, prepared.answer)
+
+    try:
+        answer = await _generate_answer(prepared)
+    except OllamaBusy as exc:
+        return {"ok": False, "busy": True, "error": str(exc)}
+    return _response(prepared, answer)
+
+
+async def _generate_answer(prepared: PreparedQuery) -> str:
+    key = prepared.answer_key()
+    cached = answers.get(key)
+    if cached is not None:
+        return cached
+
+    async def generate() -> str:
+        prompt = build_llm_prompt(prepared.question, prepared.citations)
+        try:
+            with span("query", "llm"):
+                out = await get_ollama_client().generate(prompt)
+        except OllamaBusy:
+            llm_calls_total.inc(outcome="busy")
+            raise
+        except Exception:
+            llm_calls_total.inc(outcome="error")
+            raise
+        llm_calls_total.inc(outcome="ok")
+        answers.put(key, out)
+        return out
+
+    return await answer_inflight.run(key, generate)
+
+
+async def query_pos_batch(
+    db: DB,
+    mode: Union[str, List[str]],
+    questions: List[str],
+    retrieve_k: Optional[int] = None,
+    candidate_k: Optional[int] = None,
+    debug: bool = False,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    retrieval_only: bool = False,
+) -> Dict[str, Any]:
+    modes = resolve_modes(mode)
+    if modes is None:
+        return {"ok": False, "error": f"Unknown mode: {mode}"}
+    if not questions:
+        return {"ok": True, "mode": mode, "results": []}
+
+    rk = retrieve_k or settings.retrieve_k
+    ck = candidate_k or settings.candidate_k
+
+    with trace() as tr:
+        qvecs = await encode_questions(questions)
+        retrieved_all = await fanout_search_vectors(
+            modes, qvecs, ck, nprobe=nprobe, ef_search=ef_search, norm=settings.shard_score_norm
+        )
+
+        tops = [retrieved[:rk] for retrieved in retrieved_all]
+        wanted = list(dict.fromkeys(r.chunk_key for top in tops for r in top))
+        with span("query", "fetch_chunks"):
+            chunk_rows = await asyncio.to_thread(db.list_chunks_by_keys, wanted)
+        by_key = {c["chunk_key"]: c for c in chunk_rows}
+        retrieval_timings = tr.as_dict()
+
+        prepared_all = [
+            _finalize(
+                mode=mode,
+                modes=modes,
+                question=question,
+                retrieved=retrieved,
+                lexical=[],
+                fused=[],
+                top=top,
+                by_key=by_key,
+                rk=rk,
+                debug=debug,
+                use_hybrid=False,
+            )
+            for question, retrieved, top in zip(questions, retrieved_all, tops)
+        ]
+
+        # The batch queues behind itself; handed to the client all at once, its tail
+        # would overflow the waiting room or time out waiting and come back busy.
+        generation_slots = asyncio.Semaphore(max(1, get_ollama_client().cfg.max_concurrency))
+
+        async def answer_one(prepared: PreparedQuery) -> Dict[str, Any]:
+            item = _response(prepared, prepared.answer)
+            item.pop("mode")
+            item["question"] = prepared.question
+            if prepared.answer is not None or retrieval_only:
+                return item
+            try:
+                async with generation_slots:
+                    item["answer"] = await _generate_answer(prepared)
+            except OllamaBusy as exc:
+                item.update({"ok": False, "busy": True, "error": str(exc)})
+            return item
+
+        results = await asyncio.gather(*[answer_one(p) for p in prepared_all])
+    for item in results:
+        queries_total.inc(endpoint="batch", outcome=_outcome(item))
+    await _log_if_slow(
+        "batch",
+        mode,
+        tr,
+        retrieve_k,
+        candidate_k,
+        False,
+        questions=[_question_fields(q, item) for q, item in zip(questions, results)],
+    )
+    out = {"ok": True, "mode": mode, "results": list(results)}
+    if debug:
+        out["retrieval_timings_ms"] = retrieval_timings
+    return out
+
+
+async def query_pos_stream(
+    db: DB,
+    mode: Union[str, List[str]],
+    question: str,
+    strict: bool = True,
+    retrieve_k: Optional[int] = None,
+    candidate_k: Optional[int] = None,
+    debug: bool = False,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    hybrid: Optional[bool] = None,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    tr = Trace()
+    result: Dict[str, Any] = {"ok": False}
+    async for event, payload in _query_pos_stream(
+        db, mode, question, retrieve_k, candidate_k, debug, nprobe, ef_search, hybrid, tr
+    ):
+        if event == "citations":
+            result["citations"] = payload["citations"]
+        elif event in ("done", "error"):
+            result.update(payload)
+        yield event, payload
+    queries_total.inc(endpoint="stream", outcome=_outcome(result))
+    await _log_if_slow("stream", mode, tr, retrieve_k, candidate_k, hybrid, **_question_fields(question, result))
+
+
+async def _query_pos_stream(
+    db: DB,
+    mode: Union[str, List[str]],
+    question: str,
+    retrieve_k: Optional[int],
+    candidate_k: Optional[int],
+    debug: bool,
+    nprobe: Optional[int],
+    ef_search: Optional[int],
+    hybrid: Optional[bool],
+    tr: Trace,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    with trace(tr):
+        prepared = await prepare_query(
+            db,
+            mode,
+            question,
+            retrieve_k=retrieve_k,
+            candidate_k=candidate_k,
+            debug=debug,
+            nprobe=nprobe,
+            ef_search=ef_search,
+            hybrid=hybrid,
+        )
+    if prepared is None:
+        yield "error", {"ok": False, "error": f"Unknown mode: {mode}"}
+        return
+
+    head = _response(prepared, "")
+    head.pop("answer")
+    if head["debug"] is not None:
+        head["debug"]["timings_ms"] = tr.as_dict()
+    yield "citations", head
+
+    if prepared.answer is not None:
+        yield "token", {"text": prepared.answer}
+        yield "done", {"ok": True, "refused": prepared.refused, "answer": prepared.answer}
+        return
+
+    key = prepared.answer_key()
+    cached = answers.get(key)
+    if cached is not None:
+        yield "token", {"text": cached}
+        yield "done", {"ok": True, "refused": False, "answer": cached}
+        return
+
+    prompt = build_llm_prompt(question, prepared.citations)
+    parts: List[str] = []
+    t0 = time.perf_counter()
+    try:
+        async for token in get_ollama_client().generate_stream(prompt):
+            if not parts:
+                first = time.perf_counter() - t0
+                observe("query", "llm_first_token", first)
+                tr.add("llm_first_token", first)
+            parts.append(token)
+            yield "token", {"text": token}
+    except OllamaBusy as exc:
+        llm_calls_total.inc(outcome="busy")
+        yield "error", {"ok": False, "busy": True, "error": str(exc)}
+        return
+    except Exception as exc:
+        llm_calls_total.inc(outcome="error")
+        yield "error", {"ok": False, "error": f"Generation failed: {exc}"}
+        return
+    llm_s = time.perf_counter() - t0
+    observe("query", "llm", llm_s)
+    tr.add("llm", llm_s)
+    llm_calls_total.inc(outcome="ok")
+    answer = "".join(parts).strip()
+    answers.put(key, answer)
+    yield "done", {"ok": True, "refused": False, "answer": answer}
+
+
 def build_llm_prompt(question: str, citations: List[Citation]) -> str:
     context_blocks = []
     for i, c in enumerate(citations, start=1):
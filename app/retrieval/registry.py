@@ -0,0 +1,45 @@
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.embeddings import get_embedding_model
+from app.metrics import span
+from app.retrieval.vector_store import ModeVectorStore
+
+
+class VectorStoreRegistry:
+    def __init__(self):
+        self._stores: Dict[str, ModeVectorStore] = {}
+        self._lock = threading.Lock()
+
+    def get(self, mode: str) -> ModeVectorStore:
+        store = self._stores.get(mode)
+        if store is None:
+            with self._lock:
+                store = self._stores.get(mode)
+                if store is None:
+                    store = ModeVectorStore(mode=mode, model=get_embedding_model())
+                    self._stores[mode] = store
+        store.refresh()
+        return store
+
+    def encode(self, queries: List[str]) -> np.ndarray:
+        with span("query", "encode"):
+            q = get_embedding_model().encode(queries, normalize_embeddings=True)
+        return np.asarray(q, dtype="float32")
+
+    def version(self, mode: str) -> Optional[str]:
+        store = self._stores.get(mode)
+        return store.version if store is not None else None
+
+    def warmup(self, modes: Iterable[str]) -> None:
+        get_embedding_model()
+        for m in modes:
+            self.get(m)
+
+    def loaded_modes(self) -> Dict[str, int]:
+        return {m: s.ntotal for m, s in self._stores.items()}
+
+
+registry = VectorStoreRegistry()
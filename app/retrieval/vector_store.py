@@ -1,54 +1,180 @@
-import json
+import threading
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 
 from app.config import settings
+from app.embeddings import get_embedding_model
+from app.metrics import span
+from app.retrieval.ann import index_kind, search_params
+from app.retrieval.index_files import (
+    IDS_FILE,
+    INDEX_FILE,
+    META_FILE,
+    chunk_vector_id,
+    current_dir,
+    is_bundle,
+    read_chunk_ids,
+    read_manifest,
+    verify_bundle,
+)
 
 
 @dataclass
 class Retrieved:
-    chunk_id: str
+    chunk_key: int
     score: float
+    mode: Optional[str] = None
+
+
+def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def read_index(path: Path, mmap: bool = False):
+    # Memory-mapped indexes are shared through the page cache by every worker
+    # process. IO_FLAG_MMAP_IFC (recent FAISS) maps the codes of flat, HNSW and
+    # IVF indexes alike; IO_FLAG_MMAP only maps IVF inverted lists, so it is the
+    # fallback for older builds. Anything neither supports is read normally.
+    if mmap:
+        read_only = getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+        for name in ("IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"):
+            flag = getattr(faiss, name, 0)
+            if not flag:
+                continue
+            try:
+                return faiss.read_index(str(path), flag | read_only)
+            except RuntimeError:
+                pass
+    return faiss.read_index(str(path))
 
 
 class ModeVectorStore:
-    def __init__(self, mode: str):
+    def __init__(self, mode: str, model=None):
         self.mode = mode
-        self.model = SentenceTransformer(settings.embedding_model_name)
-        self.faiss_dir = settings.index_dir / "faiss" / mode
-        self.faiss_path = self.faiss_dir / "index.faiss"
-        self.ids_path = self.faiss_dir / "chunk_ids.json"
+        self.model = model or get_embedding_model()
 
-        self._index = None
-        self._chunk_ids: List[str] = []
+        # (index, positional id -> chunk key for legacy non-IDMap indexes else None, kind)
+        self._state: Optional[Tuple[object, Optional[Dict[int, int]], str]] = None
+        self._signature: Optional[Tuple] = None
+        self._lock = threading.Lock()
+
+    def _current_signature(self) -> Optional[Tuple]:
+        d = current_dir(self.mode)
+        if d is None:
+            return None
+        sig_index = _file_signature(d / INDEX_FILE)
+        sig_ids = _file_signature(d / (META_FILE if is_bundle(d) else IDS_FILE))
+        if sig_index is None or sig_ids is None:
+            return None
+        return (str(d), sig_index, sig_ids)
 
     def load(self) -> bool:
-        if not self.faiss_path.exists() or not self.ids_path.exists():
-            return False
-        self._index = faiss.read_index(str(self.faiss_path))
-        self._chunk_ids = json.loads(self.ids_path.read_text(encoding="utf-8"))
-        return True
-
-    def search(self, query: str, top_k: int) -> List[Retrieved]:
-        if self._index is None:
+        with self._lock:
+            before = self._current_signature()
+            if before is None:
+                self._state = None
+                self._signature = None
+                return False
+            d = Path(before[0])
+            try:
+                if is_bundle(d):
+                    verify_bundle(d, read_manifest(d) or {}, checksums=settings.index_verify_checksums)
+                index = read_index(d / INDEX_FILE, mmap=settings.index_mmap)
+                # FAISS ids of IDMap indexes are the chunk keys themselves; only old
+                # positional indexes need their id list to translate results.
+                id_map = None
+                if not isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+                    id_map = {i: chunk_vector_id(cid) for i, cid in enumerate(read_chunk_ids(d))}
+            except (FileNotFoundError, RuntimeError, ValueError):
+                # The version was pruned between resolving the pointer and reading it,
+                # or fails its manifest; keep serving what we have and retry later.
+                self._signature = None
+                return self._state is not None
+            after = self._current_signature()
+
+            self._state = (index, id_map, index_kind(index))
+            # Legacy unversioned files can change while we read them; leave the
+            # signature unset so the next refresh() loads the settled pair again.
+            self._signature = before if before == after else None
+            return True
+
+    def is_stale(self) -> bool:
+        return self._signature is None or self._current_signature() != self._signature
+
+    def refresh(self) -> bool:
+        if self.is_stale():
+            return self.load()
+        return self._state is not None
+
+    @property
+    def version(self) -> Optional[str]:
+        if self._signature is None:
+            return None
+        path, (index_mtime, index_size), _ = self._signature
+        return f"{Path(path).name}-{index_mtime}-{index_size}"
+
+    @property
+    def kind(self) -> Optional[str]:
+        return self._state[2] if self._state is not None else None
+
+    @property
+    def ntotal(self) -> int:
+        return int(self._state[0].ntotal) if self._state is not None else 0
+
+    def encode(self, queries: List[str]) -> np.ndarray:
+        q = self.model.encode(queries, normalize_embeddings=True)
+        return np.asarray(q, dtype="float32")
+
+    def search(
+        self,
+        query: str,
+        top_k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[Retrieved]:
+        return self.search_vectors(self.encode([query]), top_k, nprobe=nprobe, ef_search=ef_search)[0]
+
+    def search_vectors(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> List[List[Retrieved]]:
+        state = self._state
+        if state is None:
             ok = self.load()
             if not ok:
-                return []
+                return [[] for _ in range(len(queries))]
+            state = self._state
 
-        q = self.model.encode([query], normalize_embeddings=True)
-        q = np.asarray(q, dtype="float32")
-        scores, idxs = self._index.search(q, top_k)
+        index, id_map, kind = state
+        cfg = settings.index_config(self.mode)
+        params = search_params(kind, nprobe=nprobe or cfg.nprobe, ef_search=ef_search or cfg.ef_search)
 
-        out: List[Retrieved] = []
-        for score, idx in zip(scores[0], idxs[0]):
-            if idx < 0:
-                continue
-            if idx >= len(self._chunk_ids):
-                continue
-            out.append(Retrieved(chunk_id=self._chunk_ids[idx], score=float(score)))
-        return out
\ No newline at end of file
+        with span("query", "faiss_search"):
+            if params is not None:
+                scores, idxs = index.search(queries, top_k, params=params)
+            else:
+                scores, idxs = index.search(queries, top_k)
+
+        results: List[List[Retrieved]] = []
+        for row_scores, row_idxs in zip(scores, idxs):
+            out: List[Retrieved] = []
+            for score, idx in zip(row_scores, row_idxs):
+                if idx < 0:
+                    continue
+                key = int(idx) if id_map is None else id_map.get(int(idx))
+                if key is None:
+                    continue
+                out.append(Retrieved(chunk_key=key, score=float(score), mode=self.mode))
+            results.append(out)
+        return results
@@ -1,3 +1,6 @@
+import json
+import time
+
 import requests
 import streamlit as st
 
@@ -11,7 +14,7 @@ st.caption("Modes: Study, Build, Career, Life, Health. Answers are grounded in y
 col1, col2 = st.columns([1, 1])
 
 with col1:
-    mode = st.selectbox("Mode", ["study", "build", "career", "life", "health"], index=0)
+    mode = st.selectbox("Mode", ["study", "build", "career", "life", "health", "all"], index=0)
     question = st.text_area("Ask a question", height=120, placeholder="Example: What does the rubric require for Lab 5?")
     debug = st.checkbox("Debug (show scores)", value=False)
 
@@ -21,8 +24,41 @@ with col2:
     reindex_mode = st.selectbox("Reindex mode", ["study", "build", "career", "life", "health", "all"], index=5)
     if st.button("Reindex now"):
         payload = {"modes": None} if reindex_mode == "all" else {"modes": [reindex_mode]}
-        r = requests.post(f"{API_BASE}/reindex", json=payload, timeout=600)
-        st.json(r.json())
+        r = requests.post(f"{API_BASE}/reindex", json=payload, timeout=30)
+        st.session_state["reindex_job"] = r.json().get("job_id")
+
+    job_id = st.session_state.get("reindex_job")
+    if job_id:
+        if st.button("Cancel reindex"):
+            requests.post(f"{API_BASE}/reindex/jobs/{job_id}/cancel", timeout=30)
+        progress_bar = st.progress(0.0)
+        progress_text = st.empty()
+        while True:
+            job = requests.get(f"{API_BASE}/reindex/jobs/{job_id}", timeout=30).json().get("job")
+            if not job:
+                break
+            p = job["progress"]
+            if p["files_to_index"]:
+                done = p["files_indexed"] / p["files_to_index"]
+            elif p["files_total"]:
+                done = p["files_scanned"] / p["files_total"]
+            else:
+                done = 0.0
+            progress_bar.progress(min(1.0, done))
+            eta = f", ETA {p['eta_seconds']:.0f}s" if p.get("eta_seconds") is not None else ""
+            progress_text.write(
+                f"{job['status']} ({p['stage']}, mode: {p['mode'] or '-'}): "
+                f"{p['files_scanned']}/{p['files_total']} files scanned, "
+                f"{p['files_indexed']}/{p['files_to_index']} indexed, "
+                f"{p['chunks_embedded']} chunks embedded{eta}"
+            )
+            if job["status"] in ("succeeded", "failed", "cancelled"):
+                st.session_state.pop("reindex_job", None)
+                if job["status"] == "failed":
+                    st.error(job.get("error") or "Reindex failed")
+                st.json(job)
+                break
+            time.sleep(1.0)
 
     if st.button("Status"):
         r = requests.get(f"{API_BASE}/status", timeout=30)
@@ -30,40 +66,75 @@ with col2:
 
 st.divider()
 
+def iter_sse(resp):
+    event = None
+    for line in resp.iter_lines(decode_unicode=True):
+        if not line:
+            continue
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            yield event, json.loads(line[len("data:"):].strip())
+
+
+def render_citations(citations):
+    st.subheader("Citations")
+    if not citations:
+        st.write("No citations available yet. Add sources and reindex.")
+        return
+    for i, c in enumerate(citations, start=1):
+        title = f"{i}) {c['source_path']}"
+        meta = []
+        if mode == "all" and c.get("mode"):
+            meta.append(f"mode: {c['mode']}")
+        if c.get("heading"):
+            meta.append(f"heading: {c['heading']}")
+        if c.get("page"):
+            meta.append(f"page: {c['page']}")
+        meta.append(f"score: {c['score']:.3f}")
+        with st.expander(title + " (" + ", ".join(meta) + ")"):
+            st.write(c["snippet"])
+
+
 if st.button("Ask"):
     if not question.strip():
         st.warning("Type a question first.")
     else:
         payload = {"mode": mode, "question": question, "strict": True, "debug": debug}
-        r = requests.post(f"{API_BASE}/query", json=payload, timeout=120)
-        data = r.json()
-
-        if not data.get("ok"):
-            st.error(data.get("error", "Unknown error"))
-        else:
-            refused = data.get("refused", False)
-            if refused:
-                st.error(data["answer"])
-            else:
-                st.success("Answer generated from your sources.")
-                st.text(data["answer"])
+        status_box = st.empty()
+        answer_box = st.empty()
+        citations_box = st.container()
+        head = {}
+        answer = ""
 
-            st.subheader("Citations")
-            citations = data.get("citations", [])
-            if not citations:
-                st.write("No citations available yet. Add sources and reindex.")
-            else:
-                for i, c in enumerate(citations, start=1):
-                    title = f"{i}) {c['source_path']}"
-                    meta = []
-                    if c.get("heading"):
-                        meta.append(f"heading: {c['heading']}")
-                    if c.get("page"):
-                        meta.append(f"page: {c['page']}")
-                    meta.append(f"score: {c['score']:.3f}")
-                    with st.expander(title + " (" + ", ".join(meta) + ")"):
-                        st.write(c["snippet"])
-
-            if debug and data.get("debug"):
-                st.subheader("Debug")
-                st.json(data["debug"])
\ No newline at end of file
+        status_box.info("Searching your sources…")
+        with requests.post(f"{API_BASE}/query/stream", json=payload, stream=True, timeout=120) as r:
+            for event, data in iter_sse(r):
+                if event == "error":
+                    status_box.error(data.get("error", "Unknown error"))
+                    break
+                if event == "citations":
+                    head = data
+                    if head.get("refused"):
+                        status_box.empty()
+                    else:
+                        status_box.info("Generating answer…")
+                    with citations_box:
+                        render_citations(head.get("citations", []))
+                elif event == "token":
+                    answer += data.get("text", "")
+                    if head.get("refused"):
+                        answer_box.error(answer)
+                    else:
+                        answer_box.text(answer)
+                elif event == "done":
+                    if data.get("refused"):
+                        status_box.empty()
+                        answer_box.error(data.get("answer", answer))
+                    else:
+                        status_box.success("Answer generated from your sources.")
+                        answer_box.text(data.get("answer", answer))
+
+        if debug and head.get("debug"):
+            st.subheader("Debug")
+            st.json(head["debug"])
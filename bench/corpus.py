@@ -0,0 +1,184 @@
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+FORMATS = ("txt", "md", "pdf", "docx")
+
+_ONSETS = ("b", "c", "d", "f", "g", "k", "l", "m", "n", "p", "r", "s", "t", "v", "z", "br", "st", "tr", "pl")
+_VOWELS = ("a", "e", "i", "o", "u", "ai", "ou")
+_CODAS = ("", "n", "r", "s", "t", "l", "x")
+
+
+@dataclass
+class CorpusStats:
+    files: int = 0
+    words: int = 0
+    bytes: int = 0
+    by_format: Dict[str, int] = field(default_factory=dict)
+    queries: List[str] = field(default_factory=list)
+
+
+class TextGenerator:
+    # Pseudo-words with a Zipf-like distribution, plus a handful of topic words
+    # per document so documents are distinguishable to an encoder.
+    def __init__(self, seed: int, vocab_size: int = 5000):
+        self.rng = random.Random(seed)
+        words = set()
+        while len(words) < vocab_size:
+            n = self.rng.randint(1, 3)
+            words.add("".join(self.rng.choice(_ONSETS) + self.rng.choice(_VOWELS) + self.rng.choice(_CODAS) for _ in range(n)))
+        self.vocab = sorted(words)
+        self.weights = [1.0 / (rank + 1) for rank in range(len(self.vocab))]
+
+    def topic(self, n: int = 8) -> List[str]:
+        return self.rng.sample(self.vocab[len(self.vocab) // 10:], n)
+
+    def sentence(self, topic: Sequence[str]) -> str:
+        n = self.rng.randint(8, 20)
+        words = self.rng.choices(self.vocab, weights=self.weights, k=n)
+        for i in self.rng.sample(range(n), k=min(3, n)):
+            words[i] = self.rng.choice(topic)
+        return " ".join(words).capitalize() + "."
+
+    def paragraph(self, topic: Sequence[str]) -> str:
+        return " ".join(self.sentence(topic) for _ in range(self.rng.randint(3, 6)))
+
+    def sections(self, words: int) -> List[List[str]]:
+        # [heading, paragraph, paragraph, ...] per section, about `words` words in total.
+        topic = self.topic()
+        out: List[List[str]] = []
+        total = 0
+        while total < words:
+            section = [" ".join(self.rng.sample(topic, 3)).title()]
+            for _ in range(self.rng.randint(2, 5)):
+                p = self.paragraph(topic)
+                section.append(p)
+                total += len(p.split())
+                if total >= words:
+                    break
+            out.append(section)
+        return out
+
+
+def _wrap(text: str, width: int) -> List[str]:
+    lines: List[str] = []
+    line = ""
+    for w in text.split():
+        if line and len(line) + 1 + len(w) > width:
+            lines.append(line)
+            line = w
+        else:
+            line = f"{line} {w}" if line else w
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _pdf_escape(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: Path, sections: List[List[str]], lines_per_page: int = 55) -> None:
+    # A minimal PDF 1.4 writer (Helvetica text only) so the benchmark needs no
+    # PDF authoring dependency; pypdf extracts the text back page by page.
+    lines: List[str] = []
+    for section in sections:
+        lines.append(section[0])
+        for p in section[1:]:
+            lines.extend(_wrap(p, 95))
+        lines.append("")
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    bodies: Dict[int, bytes] = {3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    page_ids: List[int] = []
+    next_id = 4
+    for page_lines in pages:
+        ops = " ".join(f"({_pdf_escape(line)}) '" for line in page_lines)
+        data = f"BT /F1 10 Tf 13 TL 50 770 Td {ops} ET".encode("latin-1", errors="replace")
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        bodies[content_id] = b"<< /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+        bodies[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+        page_ids.append(page_id)
+    bodies[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{p} 0 R" for p in page_ids)
+    bodies[2] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets: Dict[int, int] = {}
+    for i in range(1, next_id):
+        offsets[i] = len(out)
+        out += b"%d 0 obj\n" % i + bodies[i] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % next_id
+    for i in range(1, next_id):
+        out += b"%010d 00000 n \n" % offsets[i]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (next_id, xref)
+    path.write_bytes(bytes(out))
+
+
+def write_docx(path: Path, sections: List[List[str]]) -> None:
+    from docx import Document
+
+    doc = Document()
+    for section in sections:
+        doc.add_heading(section[0], level=1)
+        for p in section[1:]:
+            doc.add_paragraph(p)
+    doc.save(str(path))
+
+
+def write_text(path: Path, sections: List[List[str]], markdown: bool) -> None:
+    parts: List[str] = []
+    for section in sections:
+        parts.append(f"## {section[0]}" if markdown else section[0])
+        parts.extend(section[1:])
+    path.write_text("\n\n".join(parts) + "\n", encoding="utf-8")
+
+
+def generate_corpus(
+    root: Path,
+    n_files: int,
+    words_per_file: int = 1500,
+    formats: Sequence[str] = FORMATS,
+    seed: int = 0,
+    n_queries: int = 200,
+) -> CorpusStats:
+    for fmt in formats:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format: {fmt}")
+    root.mkdir(parents=True, exist_ok=True)
+    gen = TextGenerator(seed)
+    stats = CorpusStats()
+    sentences: List[str] = []
+    seen = 0
+    for i in range(n_files):
+        fmt = formats[i % len(formats)]
+        words = max(50, int(gen.rng.gauss(words_per_file, words_per_file / 4)))
+        sections = gen.sections(words)
+        path = root / f"doc_{i:06d}.{fmt}"
+        if fmt == "pdf":
+            write_pdf(path, sections)
+        elif fmt == "docx":
+            write_docx(path, sections)
+        else:
+            write_text(path, sections, markdown=fmt == "md")
+        stats.files += 1
+        stats.words += sum(len(p.split()) for s in sections for p in s)
+        stats.bytes += path.stat().st_size
+        stats.by_format[fmt] = stats.by_format.get(fmt, 0) + 1
+        # Reservoir-sample one sentence per file as a query, spread over the corpus.
+        sentence = gen.rng.choice(sections[0][1:]).split(". ")[0]
+        seen += 1
+        if len(sentences) < n_queries:
+            sentences.append(sentence)
+        else:
+            j = gen.rng.randrange(seen)
+            if j < n_queries:
+                sentences[j] = sentence
+    stats.queries = sentences
+    return stats
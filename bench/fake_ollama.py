@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+# A stand-in for Ollama's /api/generate with a controllable time to first token
+# and token rate, so load tests measure our stack rather than the model.
+
+WORDS = (
+    "the", "sources", "describe", "a", "plan", "for", "the", "next", "steps", "and", "list", "the",
+    "requirements", "with", "their", "deadlines", "according", "to", "SOURCE", "1", "and", "SOURCE", "2",
+)
+
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 200.0  # time to first token
+    tokens_per_s: float = 30.0
+    tokens: int = 120
+    jitter: float = 0.1  # +/- fraction applied to latency and token interval
+    model: str = "fake"
+
+
+cfg = FakeConfig()
+app = FastAPI(title="Fake Ollama")
+stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+
+
+def _jittered(seconds: float) -> float:
+    return max(0.0, seconds * (1.0 + random.uniform(-cfg.jitter, cfg.jitter)))
+
+
+def _chunk(token: str, done: bool, started: float, n: int) -> Dict[str, Any]:
+    out: Dict[str, Any] = {
+        "model": cfg.model,
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "response": token,
+        "done": done,
+    }
+    if done:
+        out.update({"total_duration": int((time.perf_counter() - started) * 1e9), "eval_count": n})
+    return out
+
+
+def _tokens(n: int):
+    for i in range(n):
+        yield ("" if i == 0 else " ") + WORDS[i % len(WORDS)]
+
+
+@app.get("/api/tags")
+def tags():
+    return {"models": [{"name": cfg.model}]}
+
+
+@app.get("/stats")
+def get_stats():
+    return {**stats, "config": cfg.__dict__}
+
+
+@app.post("/api/generate")
+async def generate(request: Request):
+    payload = await request.json()
+    stream = payload.get("stream", True)
+    started = time.perf_counter()
+    interval = 1.0 / cfg.tokens_per_s if cfg.tokens_per_s > 0 else 0.0
+    stats["requests"] += 1
+
+    if not stream:
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(_jittered(cfg.latency_ms / 1000.0) + _jittered(interval * max(0, cfg.tokens - 1)))
+        finally:
+            stats["in_flight"] -= 1
+        return _chunk("".join(_tokens(cfg.tokens)), True, started, cfg.tokens)
+
+    async def lines():
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            await asyncio.sleep(_jittered(cfg.latency_ms / 1000.0))
+            for i, token in enumerate(_tokens(cfg.tokens)):
+                if i:
+                    await asyncio.sleep(_jittered(interval))
+                yield json.dumps(_chunk(token, False, started, i + 1)) + "\n"
+            yield json.dumps(_chunk("", True, started, cfg.tokens)) + "\n"
+        finally:
+            stats["in_flight"] -= 1
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Ollama /api/generate for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency-ms", type=float, default=cfg.latency_ms, help="Time to first token.")
+    parser.add_argument("--tokens-per-s", type=float, default=cfg.tokens_per_s)
+    parser.add_argument("--tokens", type=int, default=cfg.tokens, help="Tokens per response.")
+    parser.add_argument("--jitter", type=float, default=cfg.jitter)
+    args = parser.parse_args()
+
+    cfg.latency_ms = args.latency_ms
+    cfg.tokens_per_s = args.tokens_per_s
+    cfg.tokens = args.tokens
+    cfg.jitter = args.jitter
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
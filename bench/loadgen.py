@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_QUESTIONS = (
+    "What are the deliverables for the next lab?",
+    "Summarize my notes on the project architecture.",
+    "Which deadlines are coming up this month?",
+    "What did I write about interview preparation?",
+    "List the open tasks in my build plan.",
+    "What are the requirements in the rubric?",
+    "How should I structure my weekly review?",
+    "What were the key points of the last meeting?",
+)
+
+
+@dataclass
+class Sample:
+    started: float
+    latency_s: float
+    status: str  # ok | refused | busy | http_<code> | error | timeout
+    ttft_s: Optional[float] = None  # stream endpoint: time to the first token event
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    rank = max(0, math.ceil(q / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def latency_summary(values_s: List[float]) -> Dict[str, Optional[float]]:
+    ms = sorted(v * 1000.0 for v in values_s)
+    out: Dict[str, Optional[float]] = {f"p{q}_ms": percentile(ms, q) for q in (50, 95, 99)}
+    out["mean_ms"] = sum(ms) / len(ms) if ms else None
+    out["max_ms"] = ms[-1] if ms else None
+    return {k: round(v, 2) if v is not None else None for k, v in out.items()}
+
+
+class LoadGenerator:
+    def __init__(self, args: argparse.Namespace, questions: List[str]):
+        self.args = args
+        self.questions = questions
+        self._counter = itertools.count()
+
+    def _payload(self) -> Dict:
+        n = next(self._counter)
+        question = self.questions[n % len(self.questions)]
+        if self.args.cache_bust:
+            question = f"{question} #{n}"  # defeats the query-embedding and answer caches
+        payload = {"mode": self.args.mode, "question": question}
+        if self.args.retrieve_k:
+            payload["retrieve_k"] = self.args.retrieve_k
+        return payload
+
+    async def _query(self, client: httpx.AsyncClient) -> Sample:
+        started = time.perf_counter()
+        try:
+            r = await client.post("/query", json=self._payload())
+            latency = time.perf_counter() - started
+            if r.status_code == 503:
+                return Sample(started, latency, "busy")
+            if r.status_code != 200:
+                return Sample(started, latency, f"http_{r.status_code}")
+            data = r.json()
+            if not data.get("ok"):
+                return Sample(started, latency, "error")
+            return Sample(started, latency, "refused" if data.get("refused") else "ok")
+        except httpx.TimeoutException:
+            return Sample(started, time.perf_counter() - started, "timeout")
+        except httpx.HTTPError:
+            return Sample(started, time.perf_counter() - started, "error")
+
+    async def _stream(self, client: httpx.AsyncClient) -> Sample:
+        started = time.perf_counter()
+        ttft: Optional[float] = None
+        status = "error"
+        refused = False
+        try:
+            async with client.stream("POST", "/query/stream", json=self._payload()) as r:
+                if r.status_code != 200:
+                    return Sample(started, time.perf_counter() - started, f"http_{r.status_code}")
+                event = None
+                async for line in r.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                        if event == "token" and ttft is None:
+                            ttft = time.perf_counter() - started
+                    elif line.startswith("data:") and event in ("citations", "done", "error"):
+                        data = json.loads(line[len("data:"):])
+                        if event == "citations":
+                            refused = bool(data.get("refused"))
+                        elif event == "error":
+                            status = "busy" if data.get("busy") else "error"
+                            break
+                        else:
+                            status = "refused" if refused else "ok"
+                            break
+        except httpx.TimeoutException:
+            status = "timeout"
+        except httpx.HTTPError:
+            status = "error"
+        return Sample(started, time.perf_counter() - started, status, ttft)
+
+    async def _worker(self, client: httpx.AsyncClient, delay: float, stop_at: float, out: List[Sample]) -> None:
+        await asyncio.sleep(delay)
+        call = self._stream if self.args.endpoint == "stream" else self._query
+        while time.perf_counter() < stop_at:
+            out.append(await call(client))
+
+    async def run_level(self, client: httpx.AsyncClient, concurrency: int) -> Dict:
+        # Workers start evenly over the ramp-up; only requests started after it
+        # count, so every level is measured at its full, sustained concurrency.
+        samples: List[Sample] = []
+        t0 = time.perf_counter()
+        measure_from = t0 + self.args.ramp_up
+        stop_at = measure_from + self.args.duration
+        await asyncio.gather(
+            *[
+                self._worker(client, self.args.ramp_up * i / concurrency, stop_at, samples)
+                for i in range(concurrency)
+            ]
+        )
+        window = [s for s in samples if s.started >= measure_from]
+        good = [s for s in window if s.status in ("ok", "refused")]
+        errors: Dict[str, int] = {}
+        for s in window:
+            if s.status not in ("ok", "refused"):
+                errors[s.status] = errors.get(s.status, 0) + 1
+        level = {
+            "concurrency": concurrency,
+            "requests": len(window),
+            "throughput_rps": round(len(good) / self.args.duration, 3),
+            "error_rate": round((len(window) - len(good)) / len(window), 4) if window else None,
+            "errors": errors,
+            "refused": sum(1 for s in good if s.status == "refused"),
+            "latency": latency_summary([s.latency_s for s in good]),
+        }
+        if self.args.endpoint == "stream":
+            level["ttft"] = latency_summary([s.ttft_s for s in good if s.ttft_s is not None])
+        return level
+
+
+def saturation(levels: List[Dict], min_gain: float) -> Optional[Dict]:
+    # The first level whose extra concurrency no longer buys min_gain more
+    # throughput: past it, added load only adds queueing latency.
+    best = None
+    for level in levels:
+        if best is not None and level["throughput_rps"] < best["throughput_rps"] * (1.0 + min_gain):
+            return {"concurrency": best["concurrency"], "throughput_rps": best["throughput_rps"], "p95_ms": best["latency"]["p95_ms"]}
+        best = level
+    return None
+
+
+async def run(args: argparse.Namespace, questions: List[str]) -> Dict:
+    gen = LoadGenerator(args, questions)
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    results = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        for c in levels:
+            print(f"concurrency {c}: {args.ramp_up:.0f}s ramp-up + {args.duration:.0f}s", file=sys.stderr)
+            results.append(await gen.run_level(client, c))
+            if args.cooldown:
+                await asyncio.sleep(args.cooldown)
+    return {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "url": args.url,
+            "endpoint": args.endpoint,
+            "mode": args.mode,
+            "args": vars(args),
+        },
+        "levels": results,
+        "saturation": saturation(results, args.min_gain),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive /query or /query/stream at stepped concurrency levels.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", choices=["query", "stream"], default="query")
+    parser.add_argument("--mode", default="study")
+    parser.add_argument("--questions", help="File with one question per line.")
+    parser.add_argument("--cache-bust", action="store_true", help="Make every question unique so caches never hit.")
+    parser.add_argument("--retrieve-k", type=int)
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32", help="Comma-separated sustained concurrency levels.")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds to start each level's workers over.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds per level.")
+    parser.add_argument("--cooldown", type=float, default=2.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--min-gain", type=float, default=0.05, help="Throughput gain below which a level is saturated.")
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    questions = list(DEFAULT_QUESTIONS)
+    if args.questions:
+        questions = [q.strip() for q in Path(args.questions).read_text(encoding="utf-8").splitlines() if q.strip()]
+
+    report = asyncio.run(run(args, questions))
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+# Runs one corpus size in this process. Settings are read at import time, so
+# bench.run starts this module with POS_DATA_DIR pointing at a scratch directory.
+if not os.environ.get("POS_DATA_DIR"):
+    sys.exit("bench.measure must run with POS_DATA_DIR set to a scratch directory; use python -m bench.run")
+
+from app.config import IndexConfig, settings  # noqa: E402
+from app.db import DB  # noqa: E402
+from app.embeddings import set_embedding_model  # noqa: E402
+from app.ingest.indexer import POSIndexer  # noqa: E402
+from app.retrieval.ann import KINDS, build_index, recall_at_k, search_params  # noqa: E402
+from app.retrieval.vector_store import ModeVectorStore  # noqa: E402
+from bench.corpus import FORMATS, generate_corpus  # noqa: E402
+from bench.stub_encoder import HashingEncoder  # noqa: E402
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return {"process": round(own / 2**20, 1), "largest_worker": round(children / 2**20, 1)}
+
+
+def latency_summary(samples_s: List[float]) -> Dict[str, float]:
+    ms = np.asarray(samples_s, dtype="float64") * 1000.0
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "n": int(ms.size),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(p50), 4),
+        "p95_ms": round(float(p95), 4),
+        "p99_ms": round(float(p99), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+
+def timed_searches(search, n: int) -> List[float]:
+    out = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        search(i)
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, required=True)
+    parser.add_argument("--words", type=int, default=1500)
+    parser.add_argument("--formats", default=",".join(FORMATS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--encoder", choices=["stub", "model"], default="stub")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--kinds", default=",".join(k for k in KINDS if k != "flat"))
+    args = parser.parse_args()
+
+    if args.encoder == "stub":
+        set_embedding_model(HashingEncoder(dim=args.dim))
+    mode = settings.modes[0]
+
+    t0 = time.perf_counter()
+    corpus = generate_corpus(
+        settings.sources_dir / mode,
+        n_files=args.files,
+        words_per_file=args.words,
+        formats=[f for f in args.formats.split(",") if f],
+        seed=args.seed,
+        n_queries=args.queries,
+    )
+    generate_seconds = time.perf_counter() - t0
+
+    db = DB(settings.db_path)
+    db.init()
+    indexer = POSIndexer(db=db)
+    indexer.ensure_dirs()
+
+    t0 = time.perf_counter()
+    stats = indexer.index_mode(mode)
+    index_seconds = time.perf_counter() - t0
+    ingest_rss = peak_rss_mb()
+
+    store = ModeVectorStore(mode=mode)
+    store.load()
+    queries = [corpus.queries[i % len(corpus.queries)] for i in range(args.queries)] if corpus.queries else []
+    search: Dict[str, object] = {"vectors": store.ntotal, "index_kind": store.kind}
+    qvecs = np.zeros((0, args.dim), dtype="float32")
+    if queries:
+        store.search(queries[0], args.k)  # warm up
+        search["end_to_end"] = latency_summary(timed_searches(lambda i: store.search(queries[i], args.k), len(queries)))
+        qvecs = store.encode(queries)
+        search["vectors_only"] = latency_summary(
+            timed_searches(lambda i: store.search_vectors(qvecs[i:i + 1], args.k), len(queries))
+        )
+
+    ann: Dict[str, object] = {}
+    kinds = [k for k in args.kinds.split(",") if k and k != "flat"]
+    if kinds and store.ntotal:
+        chunks = db.list_chunks_by_mode(mode)
+        vectors = indexer.embedding_cache.embed([c["text"] for c in chunks], [c["chunk_hash"] for c in chunks])
+        ids = np.asarray([c["chunk_key"] for c in chunks], dtype="int64")
+        for kind in kinds:
+            cfg = IndexConfig(kind=kind, min_vectors=0, recall_k=args.k)
+            try:
+                t0 = time.perf_counter()
+                index, _, spec = build_index(cfg, vectors, ids)
+                build_seconds = time.perf_counter() - t0
+            except RuntimeError as exc:  # e.g. too few vectors to train IVF-PQ
+                ann[kind] = {"error": str(exc)}
+                continue
+            params = search_params(kind, nprobe=cfg.nprobe, ef_search=cfg.ef_search)
+            entry = {
+                "factory": spec,
+                "build_seconds": round(build_seconds, 3),
+                f"recall_at_{args.k}": round(
+                    recall_at_k(index, vectors, ids, k=args.k, n_queries=cfg.recall_queries, params=params), 4
+                ),
+            }
+            if len(qvecs):
+                if params is not None:
+                    entry["latency"] = latency_summary(
+                        timed_searches(lambda i: index.search(qvecs[i:i + 1], args.k, params=params), len(qvecs))
+                    )
+                else:
+                    entry["latency"] = latency_summary(
+                        timed_searches(lambda i: index.search(qvecs[i:i + 1], args.k), len(qvecs))
+                    )
+            ann[kind] = entry
+
+    result = {
+        "files": corpus.files,
+        "words": corpus.words,
+        "corpus_bytes": corpus.bytes,
+        "by_format": corpus.by_format,
+        "generate_seconds": round(generate_seconds, 3),
+        "ingest": {
+            "seconds": round(index_seconds, 3),
+            "chunks": stats.total_chunks,
+            "files_per_second": round(corpus.files / index_seconds, 2) if index_seconds else None,
+            "chunks_per_second": round(stats.total_chunks / index_seconds, 2) if index_seconds else None,
+            "stage_throughput": stats.stage_throughput,
+            "peak_rss_mb": ingest_rss,
+        },
+        "search": search,
+        "ann": ann,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
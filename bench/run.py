@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from bench.corpus import FORMATS
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def run_size(files: int, args: argparse.Namespace) -> Dict:
+    # Each size gets a fresh data dir and process, so settings, caches and peak
+    # RSS never carry over between sizes.
+    with tempfile.TemporaryDirectory(prefix="pos-bench-") as tmp:
+        env = {**os.environ, "POS_DATA_DIR": tmp}
+        cmd = [
+            sys.executable,
+            "-m",
+            "bench.measure",
+            "--files", str(files),
+            "--words", str(args.words),
+            "--formats", args.formats,
+            "--seed", str(args.seed),
+            "--queries", str(args.queries),
+            "--k", str(args.k),
+            "--encoder", args.encoder,
+            "--dim", str(args.dim),
+            "--kinds", args.kinds,
+        ]
+        proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {"files": files, "error": proc.stderr.strip().splitlines()[-1:] or [f"exit code {proc.returncode}"]}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ingestion and retrieval on synthetic corpora.")
+    parser.add_argument("--sizes", default="100,1000", help="Comma-separated corpus sizes, in files.")
+    parser.add_argument("--words", type=int, default=1500, help="Mean words per file.")
+    parser.add_argument("--formats", default=",".join(FORMATS), help=f"Any of {','.join(FORMATS)}.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--encoder",
+        choices=["stub", "model"],
+        default="stub",
+        help="stub: deterministic hashing encoder; model: the configured embedding model (must be cached locally).",
+    )
+    parser.add_argument("--dim", type=int, default=384, help="Stub encoder dimension.")
+    parser.add_argument("--kinds", default="hnsw,ivf_flat,ivf_pq", help="ANN kinds to compare against exact search.")
+    parser.add_argument("--out", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args()
+
+    sizes: List[int] = [int(s) for s in args.sizes.split(",") if s]
+    report = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "runs": [],
+    }
+    for files in sizes:
+        print(f"benchmarking {files} files…", file=sys.stderr)
+        report["runs"].append(run_size(files, args))
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
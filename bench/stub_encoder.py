@@ -0,0 +1,38 @@
+import re
+import zlib
+from typing import List, Union
+
+import numpy as np
+
+_token_re = re.compile(r"\w+")
+
+
+class HashingEncoder:
+    # Deterministic stand-in for SentenceTransformer: signed feature hashing of
+    # word unigrams. Texts sharing words get similar vectors, so retrieval and
+    # recall numbers stay meaningful, and it runs offline with no model download.
+    def __init__(self, dim: int = 384, max_seq_length: int = 256):
+        self.dim = dim
+        self.max_seq_length = max_seq_length
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        normalize_embeddings: bool = False,
+        show_progress_bar: bool = False,
+        **kwargs,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            for token in _token_re.findall(text.lower())[: self.max_seq_length]:
+                h = zlib.crc32(token.encode("utf-8"))
+                out[i, h % self.dim] += -1.0 if (h >> 31) & 1 else 1.0
+        if normalize_embeddings:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if single else out
@@ -0,0 +1,108 @@
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.embeddings import get_embedding_model
+from app.ingest.chunker import Chunk, chunk_loaded_text, get_tokenizer, sentence_spans
+from app.ingest.indexer import SOURCE_SUFFIXES
+from app.ingest.loaders import load_any
+
+
+def load_pages(root: Path, limit: int) -> List[Tuple[Path, bool, object]]:
+    pages = []
+    files = sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in SOURCE_SUFFIXES)
+    for path in files[:limit] if limit else files:
+        is_md = path.suffix.lower() in (".md", ".markdown")
+        for lp in load_any(path):
+            pages.append((path, is_md, lp))
+    return pages
+
+
+def sample_queries(pages, n: int, seed: int) -> List[str]:
+    # Sentences of a reasonable length, taken from anywhere in the corpus: a query
+    # "hits" when a retrieved chunk contains the sentence it was taken from.
+    sentences = []
+    for _, _, lp in pages:
+        for s, e in sentence_spans(lp.text):
+            sent = " ".join(lp.text[s:e].split())
+            if 40 <= len(sent) <= 300:
+                sentences.append(sent)
+    random.Random(seed).shuffle(sentences)
+    return sentences[:n]
+
+
+def run(name: str, pages, queries: List[str], chunk_size: int, overlap: int, tokenizer, k: int) -> Dict:
+    t0 = time.perf_counter()
+    chunks: List[Chunk] = []
+    for _, is_md, lp in pages:
+        chunks.extend(chunk_loaded_text(lp.text, is_md, lp.page, chunk_size, overlap, tokenizer=tokenizer))
+    chunk_seconds = time.perf_counter() - t0
+
+    model = get_embedding_model()
+    limit = int(model.max_seq_length)
+    tok = get_tokenizer(settings.embedding_model_name)
+    lengths = [len(e.ids) for e in tok.encode_batch([c.text for c in chunks], add_special_tokens=True)]
+    total_tokens = sum(lengths)
+    embedded_tokens = sum(min(n, limit) for n in lengths)
+
+    t0 = time.perf_counter()
+    vectors = np.asarray(
+        model.encode([c.text for c in chunks], batch_size=settings.embed_batch_size, normalize_embeddings=True),
+        dtype="float32",
+    )
+    encode_seconds = time.perf_counter() - t0
+
+    qvecs = np.asarray(model.encode(queries, normalize_embeddings=True), dtype="float32")
+    top = np.argsort(-(qvecs @ vectors.T), axis=1)[:, :k]
+    norm_chunks = [" ".join(c.text.split()) for c in chunks]
+    hits = sum(any(q in norm_chunks[i] for i in row) for q, row in zip(queries, top))
+
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "chunk_seconds": round(chunk_seconds, 3),
+        "mean_tokens_per_chunk": round(total_tokens / max(1, len(chunks)), 1),
+        "truncated_chunks": sum(1 for n in lengths if n > limit),
+        "wasted_token_fraction": round(1 - embedded_tokens / max(1, total_tokens), 4),
+        "encode_seconds": round(encode_seconds, 3),
+        "chunks_per_second": round(len(chunks) / encode_seconds, 1) if encode_seconds else None,
+        "embedded_tokens_per_second": round(embedded_tokens / encode_seconds, 1) if encode_seconds else None,
+        f"hit_rate_at_{k}": round(hits / max(1, len(queries)), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the character and token chunkers on a source tree.")
+    parser.add_argument("--source", default=str(settings.sources_dir), help="Directory of documents to chunk.")
+    parser.add_argument("--max-files", type=int, default=0, help="Only use the first N files (0 = all).")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=settings.retrieve_k)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    pages = load_pages(Path(args.source), args.max_files)
+    queries = sample_queries(pages, args.queries, args.seed)
+
+    results = [
+        run("chars", pages, queries, settings.chunk_size_chars, settings.chunk_overlap_chars, None, args.k),
+        run(
+            "tokens",
+            pages,
+            queries,
+            settings.chunk_max_tokens,
+            settings.chunk_overlap_tokens,
+            settings.embedding_model_name,
+            args.k,
+        ),
+    ]
+    print(json.dumps({"pages": len(pages), "queries": len(queries), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
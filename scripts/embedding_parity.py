@@ -0,0 +1,93 @@
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from app.config import settings
+from app.db import DB
+from app.embeddings import backend_variant, load_backend
+
+
+def sample_texts(path: str, n: int, seed: int) -> List[str]:
+    if path:
+        texts = [t.strip() for t in Path(path).read_text(encoding="utf-8").splitlines() if t.strip()]
+    else:
+        db = DB(settings.db_path)
+        db.init()
+        texts = [c["text"] for m in settings.modes for c in db.list_chunks_by_mode(m)]
+    random.Random(seed).shuffle(texts)
+    return texts[:n]
+
+
+def encode(model, texts: List[str], batch_size: int, repeat: int) -> Dict:
+    model.encode(texts[:batch_size], batch_size=batch_size, normalize_embeddings=True)  # warm up
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        vectors = model.encode(texts, batch_size=batch_size, normalize_embeddings=True, show_progress_bar=False)
+        best = min(best, time.perf_counter() - t0)
+    return {"vectors": np.asarray(vectors, dtype="float32"), "seconds": best}
+
+
+def neighbors(vectors: np.ndarray, k: int) -> np.ndarray:
+    sims = vectors @ vectors.T
+    np.fill_diagonal(sims, -np.inf)
+    return np.argsort(-sims, axis=1)[:, :k]
+
+
+def drift(ref: np.ndarray, cand: np.ndarray, k: int) -> Dict:
+    cos = np.sum(ref * cand, axis=1)  # both sides are unit-normalized
+    ref_nn, cand_nn = neighbors(ref, k), neighbors(cand, k)
+    overlap = np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_nn.tolist(), cand_nn.tolist())])
+    return {
+        "cosine_mean": round(float(cos.mean()), 6),
+        "cosine_min": round(float(cos.min()), 6),
+        "cosine_p1": round(float(np.percentile(cos, 1)), 6),
+        "max_abs_diff": round(float(np.abs(ref - cand).max()), 6),
+        f"neighbor_overlap_at_{k}": round(float(overlap), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends against the PyTorch reference.")
+    parser.add_argument("--texts", help="File with one text per line (default: chunks from the database).")
+    parser.add_argument("--n", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=settings.embed_batch_size)
+    parser.add_argument("--threads", type=int, default=settings.embedding_threads)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--candidates",
+        default="onnx,onnx-int8",
+        help="Comma-separated backends to compare: onnx, onnx-int8 (torch is always the reference).",
+    )
+    args = parser.parse_args()
+
+    texts = sample_texts(args.texts, args.n, args.seed)
+    if len(texts) <= args.k:
+        raise SystemExit("Not enough texts; index some sources first or pass --texts.")
+
+    reference = encode(load_backend("torch", threads=args.threads), texts, args.batch_size, args.repeat)
+    results = [{"backend": "torch", "texts_per_second": round(len(texts) / reference["seconds"], 1)}]
+    for spec in [c for c in args.candidates.split(",") if c]:
+        name, _, suffix = spec.partition("-")
+        quantize = suffix == "int8"
+        out = encode(load_backend(name, quantize=quantize, threads=args.threads), texts, args.batch_size, args.repeat)
+        results.append(
+            {
+                "backend": backend_variant(name, quantize),
+                "texts_per_second": round(len(texts) / out["seconds"], 1),
+                "speedup": round(reference["seconds"] / out["seconds"], 2),
+                **drift(reference["vectors"], out["vectors"], args.k),
+            }
+        )
+    print(json.dumps({"model": settings.embedding_model_name, "texts": len(texts), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
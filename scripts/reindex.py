@@ -3,11 +3,17 @@ import argparse
 from app.config import settings
 from app.db import DB
 from app.ingest.indexer import POSIndexer
+from app.ingest.watcher import SourceWatcher
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--modes", nargs="*", default=list(settings.modes))
+    parser.add_argument("--compact", action="store_true", help="Rebuild each mode's FAISS index from scratch.")
+    parser.add_argument("--gc-embeddings", action="store_true", help="Drop cached embeddings no chunk references anymore.")
+    parser.add_argument("--profile", action="store_true", help="Write a profile of each mode's run to profile_dir.")
+    parser.add_argument("--watch", action="store_true", help="Keep running and re-index files as they change.")
+    parser.add_argument("--poll", action="store_true", help="With --watch, poll for changes instead of using inotify.")
     args = parser.parse_args()
 
     db = DB(settings.db_path)
@@ -18,9 +24,32 @@ def main():
 
     modes = [m for m in args.modes if m in settings.modes]
     for m in modes:
-        stats = idx.index_mode(m)
+        stats = idx.index_mode(m, compact=args.compact, profile=args.profile)
         print(stats)
 
+    if args.gc_embeddings:
+        print(f"removed {idx.gc_embeddings()} unreferenced embeddings")
+
+    if args.watch:
+        def handle(mode, paths):
+            stats = idx.index_mode(mode) if paths is None else idx.index_paths(mode, paths)
+            print(stats)
+
+        watcher = SourceWatcher(
+            settings.sources_dir,
+            modes,
+            handler=handle,
+            debounce_s=settings.watch_debounce_s,
+            max_delay_s=settings.watch_max_delay_s,
+            poll_interval_s=settings.watch_poll_interval_s,
+            use_inotify=settings.watch_use_inotify and not args.poll,
+        )
+        print(f"watching {settings.sources_dir} ({watcher.backend_name}), Ctrl+C to stop")
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
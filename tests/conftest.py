@@ -0,0 +1,18 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Settings are read once at import time, so the scratch data directory has to be
+# in place before anything imports app.
+os.environ.setdefault("POS_DATA_DIR", tempfile.mkdtemp(prefix="pos-tests-"))
+
+
+@pytest.fixture
+def data_dir():
+    from app.config import settings
+
+    shutil.rmtree(settings.data_dir, ignore_errors=True)
+    yield settings.data_dir
+    shutil.rmtree(settings.data_dir, ignore_errors=True)
@@ -0,0 +1,55 @@
+from app.config import settings
+from app.retrieval.lexical import lexical_confidence
+from app.retrieval.rag import _finalize, _select_top
+from app.retrieval.vector_store import Retrieved
+
+MODE = settings.modes[0]
+
+
+def rows(keys):
+    return {
+        k: {"chunk_id": f"{k:064x}", "source_path": f"{k}.txt", "text": "text", "mode": MODE}
+        for k in keys
+    }
+
+
+def finalize(retrieved, lexical):
+    top, fused = _select_top(retrieved, lexical, rk=3)
+    return _finalize(
+        mode=MODE,
+        modes=[MODE],
+        question="q",
+        retrieved=retrieved,
+        lexical=lexical,
+        fused=fused,
+        top=top,
+        by_key=rows({r.chunk_key for r in retrieved + lexical}),
+        rk=3,
+        debug=True,
+        use_hybrid=True,
+    )
+
+
+def test_lexical_confidence_is_bounded_and_monotonic():
+    assert lexical_confidence(0.0) == 0.0
+    assert 0.0 < lexical_confidence(2.0) < lexical_confidence(20.0) < 1.0
+
+
+def test_lexical_only_citation_carries_its_keyword_score():
+    dense = [Retrieved(chunk_key=1, score=0.6)]
+    lexical = [Retrieved(chunk_key=2, score=12.0)]
+
+    prepared = finalize(dense, lexical)
+
+    scores = {c.source_path: c.score for c in prepared.citations}
+    assert scores["1.txt"] == 0.6
+    assert scores["2.txt"] == lexical_confidence(12.0) > 0.0
+
+
+def test_strong_keyword_match_is_not_refused():
+    dense = [Retrieved(chunk_key=k, score=0.05) for k in (1, 2, 3)]
+    strong = [Retrieved(chunk_key=9, score=settings.lexical_score_scale * 4)]
+    weak = [Retrieved(chunk_key=9, score=0.5)]
+
+    assert not finalize(dense, strong).refused
+    assert finalize(dense, weak).refused
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.retrieval.cache import InFlight
+
+
+def test_followers_share_the_leaders_result():
+    inflight = InFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*[inflight.run("k", work) for _ in range(3)])
+
+    assert asyncio.run(main()) == ["answer"] * 3
+    assert len(calls) == 1 and inflight.coalesced == 2
+
+
+def test_cancelled_leader_hands_over_to_a_follower():
+    inflight = InFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        leader = asyncio.ensure_future(inflight.run("k", work))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(inflight.run("k", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == ["answer", "answer"]
+    assert len(calls) == 2
+    assert inflight.stats()["in_flight"] == 0
@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+docx = pytest.importorskip("docx")
+
+from app.config import settings  # noqa: E402
+from app.db import DB  # noqa: E402
+from app.embeddings import set_embedding_model  # noqa: E402
+from app.ingest.indexer import POSIndexer  # noqa: E402
+from bench.stub_encoder import HashingEncoder  # noqa: E402
+
+MODE = settings.modes[0]
+
+
+def write_docx(path, sections):
+    doc = docx.Document()
+    for heading, text in sections:
+        doc.add_heading(heading, level=1)
+        doc.add_paragraph(text)
+    doc.save(str(path))
+
+
+def test_inserting_a_docx_section_keeps_the_other_sections(data_dir):
+    set_embedding_model(HashingEncoder(dim=64))
+    db = DB(settings.db_path)
+    db.init()
+    indexer = POSIndexer(db=db)
+    indexer.ensure_dirs()
+    path = settings.sources_dir / MODE / "notes.docx"
+    sections = [
+        ("Goals", "Finish the retrieval API and write the report."),
+        ("Notes", "Meeting moved to Thursday afternoon."),
+        ("Tasks", "Review the pull requests and update the plan."),
+    ]
+    write_docx(path, sections)
+    indexer.index_mode(MODE)
+    before = {c["chunk_id"] for c in db.list_chunks_by_mode(MODE)}
+
+    write_docx(path, [("Intro", "A new first section about deadlines.")] + sections)
+    stats = indexer.index_mode(MODE)
+    after = {c["chunk_id"] for c in db.list_chunks_by_mode(MODE)}
+
+    assert (stats.changed_pages, stats.reused_pages) == (1, 3)
+    assert before < after and stats.removed_vectors == 0
+    db.close()
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+httpx = pytest.importorskip("httpx")
+
+from app.config import settings  # noqa: E402
+from app.db import DB  # noqa: E402
+from app.embeddings import set_embedding_model  # noqa: E402
+from app.ingest.indexer import POSIndexer  # noqa: E402
+from app.llm.ollama_client import OllamaClient, OllamaConfig  # noqa: E402
+from app.retrieval import rag  # noqa: E402
+from bench.stub_encoder import HashingEncoder  # noqa: E402
+
+MODE = settings.modes[0]
+
+
+def test_large_batch_queues_behind_the_llm_limit(data_dir, monkeypatch):
+    set_embedding_model(HashingEncoder(dim=64))
+    db = DB(settings.db_path)
+    db.init()
+    indexer = POSIndexer(db=db)
+    indexer.ensure_dirs()
+    text = "The pendulum lab report is due on Friday in room twelve. "
+    (settings.sources_dir / MODE / "lab.txt").write_text(text * 30, encoding="utf-8")
+    indexer.index_mode(MODE)
+
+    peak = {"now": 0, "max": 0}
+
+    async def handler(request):
+        peak["now"] += 1
+        peak["max"] = max(peak["max"], peak["now"])
+        await asyncio.sleep(0.03)
+        peak["now"] -= 1
+        return httpx.Response(200, json={"response": "Friday [SOURCE 1]", "done": True})
+
+    client = OllamaClient(OllamaConfig(max_concurrency=2, max_waiting=3, acquire_timeout=0.05))
+    client._client = httpx.AsyncClient(base_url="http://ollama", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(rag, "get_ollama_client", lambda: client)
+
+    questions = [f"{text} question {i}" for i in range(12)]
+    out = asyncio.run(rag.query_pos_batch(db, MODE, questions))
+    db.close()
+
+    answered = [r for r in out["results"] if not r["refused"]]
+    assert answered and all(r["ok"] for r in out["results"])
+    assert client.stats()["rejected"] == 0
+    assert peak["max"] <= 2
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+
+from app.config import settings  # noqa: E402
+from app.db import DB  # noqa: E402
+from app.embeddings import set_embedding_model  # noqa: E402
+from app.ingest.indexer import POSIndexer  # noqa: E402
+from app.metrics import trace  # noqa: E402
+from app.retrieval.executor import RetrievalBatcher  # noqa: E402
+from bench.stub_encoder import HashingEncoder  # noqa: E402
+
+MODE = settings.modes[0]
+
+
+def test_batched_search_is_timed_in_each_callers_trace(data_dir):
+    set_embedding_model(HashingEncoder(dim=64))
+    db = DB(settings.db_path)
+    db.init()
+    indexer = POSIndexer(db=db)
+    indexer.ensure_dirs()
+    (settings.sources_dir / MODE / "lab.txt").write_text("Measure the pendulum period. " * 40, encoding="utf-8")
+    indexer.index_mode(MODE)
+    db.close()
+
+    batcher = RetrievalBatcher(window_ms=20.0, max_batch=8)
+
+    async def one(question):
+        with trace() as tr:
+            hits = await batcher.search([MODE], question, 3)
+        return hits, tr.stages
+
+    async def both():
+        return await asyncio.gather(one("pendulum period"), one("lab measurements"))
+
+    for hits, stages in asyncio.run(both()):
+        assert hits
+        assert stages["encode"] > 0 and stages["faiss_search"] > 0
@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+
+from app.config import settings  # noqa: E402
+from app.db import DB  # noqa: E402
+from app.embeddings import set_embedding_model  # noqa: E402
+from app.ingest.indexer import POSIndexer  # noqa: E402
+from app.llm.ollama_client import OllamaConfig  # noqa: E402
+from app.profiling import slow_queries  # noqa: E402
+from app.retrieval import rag  # noqa: E402
+from bench.stub_encoder import HashingEncoder  # noqa: E402
+
+MODE = settings.modes[0]
+
+
+class _FakeClient:
+    cfg = OllamaConfig()
+
+    async def generate_stream(self, prompt):
+        for token in ("Friday ", "[SOURCE 1]"):
+            yield token
+
+
+def test_stream_and_batch_queries_are_logged_when_slow(data_dir, tmp_path, monkeypatch):
+    set_embedding_model(HashingEncoder(dim=64))
+    db = DB(settings.db_path)
+    db.init()
+    indexer = POSIndexer(db=db)
+    indexer.ensure_dirs()
+    text = "The pendulum lab report is due on Friday in room twelve. "
+    (settings.sources_dir / MODE / "lab.txt").write_text(text * 30, encoding="utf-8")
+    indexer.index_mode(MODE)
+
+    monkeypatch.setattr(slow_queries, "path", tmp_path / "slow.jsonl")
+    monkeypatch.setattr(slow_queries, "threshold_ms", 0.001)
+    monkeypatch.setattr(rag, "get_ollama_client", lambda: _FakeClient())
+
+    async def stream():
+        return [event async for event, _ in rag.query_pos_stream(db, MODE, text, hybrid=False)]
+
+    events = asyncio.run(stream())
+    asyncio.run(rag.query_pos_batch(db, MODE, [text, "room twelve"], retrieval_only=True))
+    db.close()
+
+    entries = [json.loads(line) for line in (tmp_path / "slow.jsonl").read_text().splitlines()]
+    assert [e["endpoint"] for e in entries] == ["stream", "batch"]
+    streamed, batched = entries
+    assert events[-1] == "done" and streamed["outcome"] == "answered"
+    assert streamed["scores"] and streamed["timings_ms"]["llm"] > 0
+    assert streamed["elapsed_ms"] >= streamed["timings_ms"]["llm"]
+    assert len(batched["questions"]) == 2
+    assert batched["timings_ms"]["fetch_chunks"] > 0
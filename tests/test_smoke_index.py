@@ -0,0 +1,114 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("faiss")
+
+from app.config import settings  # noqa: E402
+from app.db import DB  # noqa: E402
+from app.embeddings import set_embedding_model  # noqa: E402
+from app.ingest.indexer import POSIndexer  # noqa: E402
+from app.retrieval import index_files  # noqa: E402
+from app.retrieval.vector_store import ModeVectorStore  # noqa: E402
+from bench.stub_encoder import HashingEncoder  # noqa: E402
+
+MODE = settings.modes[0]
+
+NOTES = {
+    "lab.txt": "The lab report is due on Friday. Measure the pendulum period for five lengths. " * 20,
+    "plan.md": "# Build plan\n\nShip the ingestion pipeline first, then the retrieval API. " * 20,
+    "review.txt": "Weekly review: list open tasks, check deadlines and archive finished notes. " * 20,
+}
+
+
+@pytest.fixture
+def indexer(data_dir):
+    set_embedding_model(HashingEncoder(dim=64))
+    db = DB(settings.db_path)
+    db.init()
+    indexer = POSIndexer(db=db)
+    indexer.ensure_dirs()
+    for name, text in NOTES.items():
+        (settings.sources_dir / MODE / name).write_text(text, encoding="utf-8")
+    yield indexer
+    db.close()
+
+
+def test_index_publishes_a_searchable_version(indexer):
+    stats = indexer.index_mode(MODE)
+
+    assert stats.indexed_files == len(NOTES)
+    assert stats.total_chunks == indexer.db.count_chunks_by_mode(MODE) > 0
+    assert stats.full_rebuild
+    assert (stats.embedding_cache_hits, stats.embedding_cache_misses) == (0, stats.total_chunks)
+    assert index_files.read_current(MODE) == "v1"
+    current = index_files.current_dir(MODE)
+    assert sorted(index_files.read_chunk_ids(current)) == sorted(
+        c["chunk_id"] for c in indexer.db.list_chunks_by_mode(MODE)
+    )
+
+    store = ModeVectorStore(mode=MODE)
+    assert store.load()
+    assert store.ntotal == stats.total_chunks
+    hits = store.search("pendulum period lab report", 3)
+    top = indexer.db.list_chunks_by_keys([hits[0].chunk_key])
+    assert top and top[0]["source_path"].endswith("lab.txt")
+
+
+def test_reindex_updates_and_prunes_versions(indexer):
+    indexer.index_mode(MODE)
+    (settings.sources_dir / MODE / "review.txt").unlink()
+    (settings.sources_dir / MODE / "extra.md").write_text("Interview preparation notes. " * 30, encoding="utf-8")
+
+    stats = indexer.index_mode(MODE)
+
+    assert stats.deleted_files == 1 and stats.indexed_files == 1
+    store = ModeVectorStore(mode=MODE)
+    assert store.load()
+    assert store.ntotal == stats.total_chunks == indexer.db.count_chunks_by_mode(MODE)
+    assert index_files.read_current(MODE) == "v2"
+    assert len(index_files.list_versions(MODE)) <= max(settings.index_keep_versions, 1)
+
+
+def test_removing_every_source_unpublishes_the_index(indexer):
+    indexer.index_mode(MODE)
+    for name in NOTES:
+        (settings.sources_dir / MODE / name).unlink()
+
+    stats = indexer.index_mode(MODE)
+
+    assert stats.total_chunks == 0
+    assert index_files.current_dir(MODE) is None
+
+
+def test_index_paths_updates_only_the_given_files(indexer):
+    indexer.index_mode(MODE)
+    lab = settings.sources_dir / MODE / "lab.txt"
+    lab.write_text("The lab moved to Monday. Bring the stopwatch. " * 20, encoding="utf-8")
+    (settings.sources_dir / MODE / "review.txt").unlink()
+
+    stats = indexer.index_paths(MODE, [lab, settings.sources_dir / MODE / "review.txt"])
+
+    assert (stats.scanned_files, stats.indexed_files, stats.deleted_files) == (1, 1, 1)
+    store = ModeVectorStore(mode=MODE)
+    assert store.load()
+    assert store.ntotal == stats.total_chunks == indexer.db.count_chunks_by_mode(MODE)
+
+
+def test_index_left_behind_by_a_failed_update_is_rebuilt(indexer, monkeypatch):
+    indexer.index_mode(MODE)
+    lab = settings.sources_dir / MODE / "lab.txt"
+    lab.write_text(NOTES["lab.txt"].replace("Friday", "Monday"), encoding="utf-8")
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(indexer, "_write_index", fail)
+        with pytest.raises(RuntimeError):
+            indexer.index_mode(MODE)
+
+    stats = indexer.index_mode(MODE)
+
+    assert stats.full_rebuild
+    db_ids = sorted(c["chunk_id"] for c in indexer.db.list_chunks_by_mode(MODE))
+    assert sorted(index_files.read_chunk_ids(index_files.current_dir(MODE))) == db_ids
@@ -0,0 +1,20 @@
+import time
+
+from app.ingest.watcher import _PollingBackend
+
+
+def test_polling_rescans_at_the_configured_interval(tmp_path):
+    backend = _PollingBackend({"study": tmp_path}, interval_s=0.2)
+    scans = []
+    scan = backend._scan
+    backend._scan = lambda root: scans.append(root) or scan(root)
+
+    events = []
+    stop_at = time.monotonic() + 0.5
+    while time.monotonic() < stop_at:
+        events += backend.poll(0.05)
+        if len(scans) == 1 and not (tmp_path / "a.txt").exists():
+            (tmp_path / "a.txt").write_text("new", encoding="utf-8")
+
+    assert 2 <= len(scans) <= 3
+    assert events == [("study", tmp_path / "a.txt")]